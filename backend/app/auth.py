@@ -1,29 +1,56 @@
 import os
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 
-from .db import get_db
+from .db import get_db, get_async_db
 from .models import User, Role
+from .cache import TTLCache
+from . import passwords
 
 # === Config JWT ===
 SECRET_KEY = os.getenv("JWT_SECRET", "changeme")
 ALGORITHM = os.getenv("JWT_ALG", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "60"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# === Cache principal autentificat (per proces) ===
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+
+pwd_context = passwords.pwd_context
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+@dataclass(frozen=True)
+class Principal:
+    """Utilizatorul autentificat, fara sesiune DB (ce e nevoie pentru rute si roluri)"""
+    id: int
+    username: str
+    email: str
+    is_active: bool
+    roles: Tuple[str, ...]
+
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+def invalidate_principal(username: str):
+    """De apelat dupa orice modificare de roluri/status/stergere a unui utilizator"""
+    principal_cache.invalidate(username)
+
 # === Helpers ===
+# bcrypt ruleaza in pool-ul de procese dedicat (vezi passwords.py), nu in workerul cererii
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return passwords.verify_and_update(plain_password, hashed_password)[0]
+
+def verify_and_update_password(plain_password, hashed_password):
+    return passwords.verify_and_update(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return passwords.hash_password(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -32,29 +59,81 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 # === Dependencies ===
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _token_subject(token: str) -> str:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    return username
 
-    user: Optional[User] = db.query(User).filter(User.username == username).first()
-    if user is None or not user.is_active:
-        raise credentials_exception
+def _principal_query(username: str):
+    # Un singur query: utilizator + roluri (joined eager load)
+    return select(User).options(joinedload(User.roles)).where(User.username == username)
+
+def _cache_principal(username: str, user: Optional[User]) -> Principal:
+    if user is None:
+        raise _credentials_exception()
+    principal = Principal(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        is_active=user.is_active,
+        roles=tuple(r.name for r in user.roles),
+    )
+    principal_cache.set(username, principal)
+    return principal
+
+def _check_active(principal: Principal) -> Principal:
+    if not principal.is_active:
+        raise _credentials_exception()
+    return principal
+
+def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> Principal:
+    return principal_from_token(db, token)
+
+def principal_from_token(db: Session, token: str) -> Principal:
+    """Folosit direct unde tokenul nu vine in header (WebSocket, EventSource)"""
+    username = _token_subject(token)
+    principal: Optional[Principal] = principal_cache.get(username)
+    if principal is None:
+        user = db.execute(_principal_query(username)).unique().scalar_one_or_none()
+        principal = _cache_principal(username, user)
+        # Conexiunea se elibereaza acum: rutele de citire lucreaza pe alta sesiune (get_read_db)
+        db.rollback()
+    return _check_active(principal)
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
+) -> Principal:
+    username = _token_subject(token)
+    principal: Optional[Principal] = principal_cache.get(username)
+    if principal is None:
+        user = (await db.execute(_principal_query(username))).unique().scalar_one_or_none()
+        principal = _cache_principal(username, user)
+    return _check_active(principal)
+
+def _check_roles(user: Principal, required: List[str]) -> Principal:
+    names = set(user.roles)
+    if not any(r in names for r in required):
+        raise HTTPException(status_code=403, detail="Insufficient role")
     return user
 
 def require_roles(required: List[str]):
-    def checker(user: User = Depends(get_current_user)):
-        names = {r.name for r in user.roles}
-        if not any(r in names for r in required):
-            raise HTTPException(status_code=403, detail="Insufficient role")
-        return user
+    def checker(user: Principal = Depends(get_current_user)):
+        return _check_roles(user, required)
+    return checker
+
+def require_roles_async(required: List[str]):
+    async def checker(user: Principal = Depends(get_current_user_async)):
+        return _check_roles(user, required)
     return checker
@@ -0,0 +1,192 @@
+import hashlib
+import hmac
+import logging
+import secrets
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from jose import jwt, JWTError
+
+from minio.commonconfig import CopySource
+from minio.error import S3Error
+from sqlalchemy import delete, event, select, text, update
+from sqlalchemy.orm import Session
+
+from .auth import SECRET_KEY, ALGORITHM
+from .db import SessionLocal, dialect_insert
+from .models import Blob, File as FileModel
+from .storage import minio_client, MINIO_BUCKET
+
+logger = logging.getLogger(__name__)
+
+# Stocare adresata prin continut: un obiect MinIO per sha256, cu numar de referinte in `blobs`.
+# Invariant: cat timp randul din `blobs` e vizibil (commit), obiectul exista in MinIO.
+# De aceea obiectele se sterg doar dupa commit-ul care a sters randul (un rollback le pastreaza),
+# sub acelasi lock per sha256 pe care il ia store(): un upload concurent nu isi pierde obiectul.
+
+
+def blob_key(sha256: str) -> str:
+    return f"blobs/{sha256[:2]}/{sha256}"
+
+
+def _lock(db: Session, sha256: str):
+    """Serializeaza store() si stergerea obiectelor pentru acelasi continut (pana la commit)"""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"blob:{sha256}"})
+
+
+class HashingReader:
+    """Calculeaza sha256 pe masura ce MinIO citeste fluxul (o singura trecere peste date)"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._sha = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.raw.read(size)
+        self._sha.update(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._sha.hexdigest()
+
+
+def store(db: Session, tmp_object: str, sha256: str, size: int, content_type: Optional[str]) -> tuple:
+    """
+    Promoveaza un obiect incarcat sub cheie temporara la cheia lui de continut.
+    Returneaza (object_name, nou). Apelantul face commit; obiectul temporar e sters oricum.
+    """
+    # Un release() deja comis isi termina intai stergerea obiectului; apoi il recopiem
+    _lock(db, sha256)
+    stmt = dialect_insert(Blob.__table__).values(
+        sha256=sha256, object_name=blob_key(sha256), size=size, content_type=content_type, refcount=1
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["sha256"], set_={"refcount": Blob.__table__.c.refcount + 1}
+    ).returning(Blob.__table__.c.refcount)
+    try:
+        new = db.execute(stmt).scalar_one() == 1
+        if new:
+            minio_client.copy_object(MINIO_BUCKET, blob_key(sha256), CopySource(MINIO_BUCKET, tmp_object))
+    finally:
+        _remove(tmp_object)
+    return blob_key(sha256), new
+
+
+def reference(db: Session, sha256: str):
+    """Inca o referinta la un continut deja stocat (fara transfer): (object_name, size) sau None"""
+    return db.execute(
+        update(Blob).where(Blob.sha256 == sha256).values(refcount=Blob.refcount + 1)
+        .returning(Blob.object_name, Blob.size)
+    ).first()
+
+
+# === Dovada de posesie (POST /files/by-hash) ===
+# Hash-ul singur nu dovedeste ca clientul are continutul: cere sha256 peste un interval ales de server
+CHALLENGE_BYTES = 64 * 1024
+CHALLENGE_TTL = 300
+
+
+def challenge(user_id: int, sha256: str, size: int) -> dict:
+    """Emis si pentru continut necunoscut: raspunsul nu dezvaluie daca un blob exista"""
+    length = min(CHALLENGE_BYTES, size)
+    offset = secrets.randbelow(size - length + 1)
+    # Fara "sub": tokenul nu poate fi folosit ca token de acces
+    token = jwt.encode({
+        "typ": "by-hash", "uid": user_id, "sha256": sha256, "size": size, "offset": offset, "length": length,
+        "exp": datetime.utcnow() + timedelta(seconds=CHALLENGE_TTL),
+    }, SECRET_KEY, algorithm=ALGORITHM)
+    return {"challenge": token, "offset": offset, "length": length, "expires_in": CHALLENGE_TTL}
+
+
+def possesses(db: Session, user_id: int, sha256: str, size: int, token: Optional[str], proof: Optional[str]) -> bool:
+    """Utilizatorul are deja un fisier cu acest continut sau a raspuns corect la challenge"""
+    owned = db.execute(
+        select(FileModel.id).where(FileModel.owner_id == user_id, FileModel.sha256 == sha256).limit(1)
+    ).first()
+    if owned:
+        return True
+    if not token or not proof:
+        return False
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return False
+    if (claims.get("typ"), claims.get("uid"), claims.get("sha256"), claims.get("size")) != ("by-hash", user_id, sha256, size):
+        return False
+    blob = db.get(Blob, sha256)
+    if blob is None or blob.size != size:
+        return False
+    obj = minio_client.get_object(MINIO_BUCKET, blob.object_name, offset=claims["offset"], length=claims["length"])
+    try:
+        data = obj.read()
+    finally:
+        obj.close()
+        obj.release_conn()
+    return hmac.compare_digest(hashlib.sha256(data).hexdigest(), proof)
+
+
+def release(db: Session, rec: FileModel):
+    """
+    Sterge randul File; obiectul MinIO dispare doar odata cu ultima referinta.
+    Apelantul face commit; stergerea din MinIO are loc abia dupa commit.
+    """
+    db.delete(rec)
+    db.flush()  # randul din files pleaca inaintea celui din blobs (cheie straina)
+    derived = [name for name in (rec.thumbnail_object, rec.text_object) if name]
+    if rec.sha256 is None:
+        # Obiect per-user: poate fi folosit de alt rand cu acelasi object_name (reincarcare)
+        shared = db.execute(
+            select(FileModel.id).where(FileModel.object_name == rec.object_name, FileModel.id != rec.id).limit(1)
+        ).first()
+        if not shared:
+            _remove_after_commit(db, None, [rec.object_name, *derived])
+        return
+
+    left = db.execute(
+        update(Blob).where(Blob.sha256 == rec.sha256).values(refcount=Blob.refcount - 1).returning(Blob.refcount)
+    ).scalar_one_or_none()
+    if left is not None and left <= 0:
+        db.execute(delete(Blob).where(Blob.sha256 == rec.sha256))
+        _remove_after_commit(db, rec.sha256, [blob_key(rec.sha256), *derived])
+
+
+def _remove_after_commit(db: Session, sha256: Optional[str], object_names: List[str]):
+    db.info.setdefault("blob_removals", []).append((sha256, object_names))
+
+
+@event.listens_for(Session, "after_commit")
+def _on_commit(session):
+    for sha256, object_names in session.info.pop("blob_removals", ()):
+        try:
+            _remove_unreferenced(sha256, object_names)
+        except Exception:
+            # Commit-ul e deja facut: un obiect orfan e raportat de reconcile, nu e o eroare a cererii
+            logger.warning("could not clean up %s", object_names, exc_info=True)
+
+
+@event.listens_for(Session, "after_rollback")
+def _on_rollback(session):
+    session.info.pop("blob_removals", None)
+
+
+def _remove_unreferenced(sha256: Optional[str], object_names: List[str]):
+    if sha256 is None:
+        for object_name in object_names:
+            _remove(object_name)
+        return
+    with SessionLocal() as db:
+        _lock(db, sha256)
+        # Intre timp un upload poate fi re-creat blob-ul (si re-copiat obiectul): atunci ramane
+        if db.get(Blob, sha256) is None:
+            for object_name in object_names:
+                _remove(object_name)
+        db.commit()
+
+
+def _remove(object_name: str):
+    try:
+        minio_client.remove_object(MINIO_BUCKET, object_name)
+    except S3Error:
+        # Un obiect orfan e inofensiv (un upload viitor il suprascrie); pierderea de date nu
+        logger.warning("could not remove %s", object_name, exc_info=True)
@@ -0,0 +1,209 @@
+import json
+import os
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional: fara brotli se negociaza doar gzip
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # optional: fara msgpack raspunsurile raman JSON
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# === Config ===
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+# Sub prag castigul e neglijabil (un pachet TCP) si nu merita CPU-ul
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Niveluri moderate: raspunsurile sunt dinamice, comprimate la fiecare cerere
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "5"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+MSGPACK_ENABLED = os.getenv("MSGPACK_ENABLED", "true").lower() == "true"
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/msgpack", "text/")
+# SSE: evenimentele trebuie sa ajunga imediat, nu dupa un bloc comprimat
+EXCLUDED_TYPES = ("text/event-stream",)
+
+
+def _qvalues(header: str) -> Dict[str, float]:
+    """'gzip, br;q=0.9' -> {'gzip': 1.0, 'br': 0.9}"""
+    values = {}
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        values[name] = q
+    return values
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Cea mai preferata codare suportata; la egalitate brotli (comprima mai bine JSON-ul)"""
+    q = _qvalues(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in ("br", "gzip") if brotli else ("gzip",):
+        weight = q.get(encoding, q.get("*", 0.0))
+        if weight > best_q:
+            best, best_q = encoding, weight
+    return best
+
+
+def wants_msgpack(accept: str) -> bool:
+    q = _qvalues(accept)
+    weight = max(q.get(t, 0.0) for t in MSGPACK_TYPES)
+    return weight > 0 and weight >= q.get("application/json", 0.0)
+
+
+class _Encoder:
+    """Encoder incremental: fiecare bucata e emisa imediat (flush), ca streaming-ul sa ramana streaming"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._br = None
+            self._gz = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = format gzip
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self._br:
+            return self._br.process(chunk) + self._br.flush()
+        return self._gz.compress(chunk) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._br.finish() if self._br else self._gz.flush()
+
+    def compress_all(self, body: bytes) -> bytes:
+        """Corp complet: fara flush intermediar"""
+        if self._br:
+            return self._br.process(body) + self._br.finish()
+        return self._gz.compress(body) + self._gz.flush()
+
+
+def _to_msgpack(body: bytes) -> Optional[bytes]:
+    try:
+        content = orjson.loads(body) if orjson else json.loads(body)
+    except ValueError:
+        return None
+    return msgpack.packb(content)
+
+
+def _weak(headers: MutableHeaders):
+    """Corpul transmis difera de cel pentru care s-a calculat ETag-ul: validatorul devine slab"""
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["etag"] = "W/" + etag
+
+
+class _Responder:
+    def __init__(self, send, encoding: Optional[str], msgpack_ok: bool):
+        self.send = send
+        self.encoding = encoding
+        self.msgpack_ok = msgpack_ok
+        self.start = None
+        self.encoder: Optional[_Encoder] = None
+        self.passthrough = False
+
+    def _eligible(self, headers: MutableHeaders) -> bool:
+        status = self.start["status"]
+        content_type = headers.get("content-type", "").lower()
+        # Range / fisiere: Content-Range se refera la octetii necomprimati
+        return (
+            200 <= status < 300 and status != 204
+            and "content-encoding" not in headers
+            and "accept-ranges" not in headers
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+            and not content_type.startswith(EXCLUDED_TYPES)
+        )
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = MutableHeaders(scope=message)
+            if self._eligible(headers):
+                headers.add_vary_header("Accept-Encoding")
+                if headers.get("content-type", "").startswith("application/json"):
+                    headers.add_vary_header("Accept")
+            else:
+                self.passthrough = True
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            if self.start is not None:
+                await self.send(self.start)
+                self.start = None
+            return await self.send(message)
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(scope=start)
+            if not more_body:
+                await self._send_complete(start, headers, body)
+                return
+            # Streaming: MessagePack nu se aplica (NDJSON/CSV); comprimare daca nu stim deja ca e mic
+            length = headers.get("content-length")
+            if self.encoding and not (length and int(length) < COMPRESSION_MIN_SIZE):
+                self.encoder = _Encoder(self.encoding)
+                del headers["content-length"]
+                headers["content-encoding"] = self.encoding
+                _weak(headers)
+            await self.send(start)
+
+        if self.encoder is None:
+            return await self.send(message)
+        chunk = self.encoder.compress(body) if body else b""
+        if not more_body:
+            chunk += self.encoder.finish()
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _send_complete(self, start, headers: MutableHeaders, body: bytes):
+        original = body
+        if self.msgpack_ok and body and headers.get("content-type", "").startswith("application/json"):
+            packed = _to_msgpack(body)
+            if packed is not None:
+                body = packed
+                headers["content-type"] = "application/msgpack"
+                _weak(headers)
+        if self.encoding and len(body) >= COMPRESSION_MIN_SIZE:
+            body = _Encoder(self.encoding).compress_all(body)
+            headers["content-encoding"] = self.encoding
+            _weak(headers)
+        if body is not original:
+            headers["content-length"] = str(len(body))
+        await self.send(start)
+        await self.send({"type": "http.response.body", "body": body, "more_body": False})
+
+
+class CompressionMiddleware:
+    """gzip/brotli negociat prin Accept-Encoding si, la cerere (Accept), MessagePack in loc de JSON"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (COMPRESSION_ENABLED or MSGPACK_ENABLED):
+            return await self.app(scope, receive, send)
+        headers = Headers(scope=scope)
+        encoding = choose_encoding(headers.get("accept-encoding", "")) if COMPRESSION_ENABLED else None
+        msgpack_ok = MSGPACK_ENABLED and msgpack is not None and wants_msgpack(headers.get("accept", ""))
+        await self.app(scope, receive, _Responder(send, encoding, msgpack_ok))
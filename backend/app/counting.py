@@ -0,0 +1,65 @@
+import os
+import threading
+from typing import Hashable, Literal, Tuple
+
+from sqlalchemy import select, func, text
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+
+# Strategii pentru "total" in listele paginate:
+#   exact     - COUNT(*) la fiecare cerere
+#   cached    - COUNT(*) memorat per (tabel, filtre) cateva secunde, invalidat la scrieri
+#   estimated - pg_class.reltuples pentru liste nefiltrate (cu filtre => cached)
+CountStrategy = Literal["exact", "cached", "estimated"]
+
+DEFAULT_COUNT_STRATEGY = os.getenv("COUNT_STRATEGY", "exact")
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "10"))
+
+count_cache = TTLCache(maxsize=1024, ttl=COUNT_CACHE_TTL)
+
+# Generatie per tabel: o scriere o incrementeaza si toate intrarile vechi devin inaccesibile
+_generations = {}
+_lock = threading.Lock()
+
+
+def invalidate_counts(table: str):
+    with _lock:
+        _generations[table] = _generations.get(table, 0) + 1
+
+
+def _exact(db: Session, stmt) -> int:
+    return db.execute(select(func.count()).select_from(stmt.order_by(None).subquery())).scalar_one()
+
+
+def _estimated(db: Session, table: str):
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    est = db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}
+    ).scalar()
+    # -1 = tabel neanalizat inca (ANALYZE/autovacuum nu a rulat)
+    return est if est is not None and est >= 0 else None
+
+
+def count_rows(
+    db: Session, stmt, table: str, signature: Hashable, filtered: bool, strategy: CountStrategy
+) -> Tuple[int, str]:
+    """Returneaza (total, strategia folosita efectiv)"""
+    if strategy == "estimated":
+        if not filtered:
+            est = _estimated(db, table)
+            if est is not None:
+                return est, "estimated"
+        strategy = "cached"
+
+    if strategy == "cached":
+        key = (table, _generations.get(table, 0), signature)
+        total = count_cache.get(key)
+        if total is not None:
+            return total, "cached"
+        total = _exact(db, stmt)
+        count_cache.set(key, total)
+        return total, "exact"
+
+    return _exact(db, stmt), "exact"
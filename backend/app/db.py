@@ -1,20 +1,364 @@
+import hashlib
+import itertools
+import logging
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from .metrics import Family, Histogram
+
+logger = logging.getLogger(__name__)
 
 # URL-ul bazei de date il luam din .env
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Replici de citire (optional): URL-uri separate prin virgula; gol = totul pe primar
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+# Cat timp dupa o scriere citirile aceluiasi client merg pe primar (read-your-writes)
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+# Un replica cazut sau in urma e scos din rotatie cel putin atat
+DB_REPLICA_EJECT_SECONDS = float(os.getenv("DB_REPLICA_EJECT_SECONDS", "30"))
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "10"))
+# Verificare periodica (conectare + lag); 0 = doar ejectare pasiva la erori de conexiune
+DB_REPLICA_HEALTHCHECK_INTERVAL = float(os.getenv("DB_REPLICA_HEALTHCHECK_INTERVAL", "5"))
+DB_STICKY_MAX_KEYS = int(os.getenv("DB_STICKY_MAX_KEYS", "100000"))
+
+# Mod async (asyncpg + AsyncSession) pentru rutele fierbinti; comutabil pentru benchmark
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or (DATABASE_URL or "").replace("+psycopg2", "+asyncpg")
+
+# Parametrii pool-ului de conexiuni (dimensionati dupa numarul de workeri uvicorn)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# > 0: verificare periodica in fundal in loc de pre-ping la fiecare checkout
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", "0"))
+DB_POOL_PRE_PING = (
+    os.getenv("DB_POOL_PRE_PING", "true").lower() == "true" and DB_POOL_HEALTHCHECK_INTERVAL <= 0
+)
+
+
+class PoolMetrics:
+    """Contoare pentru pool: checkout-uri, conexiuni noi, timeouts, timp de asteptare"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.healthcheck_failures = 0
+        self.wait_time = Histogram()
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool care masoara cat asteapta o cerere dupa o conexiune libera"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        finally:
+            pool_metrics.wait_time.observe(time.perf_counter() - start)
+
+
 # Engine SQLAlchemy
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_conn, record, proxy):
+    pool_metrics.checkouts += 1
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_conn, record):
+    pool_metrics.checkins += 1
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_conn, record):
+    pool_metrics.connects += 1
+
+# === Replici de citire ===
+db_reads = Family("db_read_sessions_total", "Sesiuni de citire dupa destinatie", "counter", ("target",))
+replica_ejections = Family("db_replica_ejections_total", "Replici scoase din rotatie", "counter", ("replica",))
+
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+        self.ejected_until = 0.0
+        self.last_error: Optional[str] = None
+        self.lag_seconds: Optional[float] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.ejected_until <= time.monotonic()
+
+    def eject(self, reason: str):
+        if self.healthy:
+            replica_ejections.labels(self.name).inc()
+            logger.warning("DB replica %s ejected: %s", self.name, reason)
+        self.ejected_until = time.monotonic() + DB_REPLICA_EJECT_SECONDS
+        self.last_error = reason
+
+    def status(self) -> dict:
+        pool = self.engine.pool
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "last_error": self.last_error,
+            "checked_out": pool.checkedout(),
+        }
+
+
+replicas: List[Replica] = [Replica(f"replica{i}", url) for i, url in enumerate(DATABASE_REPLICA_URLS)]
+_round_robin = itertools.count()
+
+
+def _candidates() -> List[Replica]:
+    """Replicile sanatoase, incepand cu urmatorul din rotatie"""
+    if not replicas:
+        return []
+    start = next(_round_robin) % len(replicas)
+    return [r for r in replicas[start:] + replicas[:start] if r.healthy]
+
+
+# Scrieri recente per client (LRU marginit, per proces): cheie -> momentul pana la care citim de pe primar
+_recent_writes: "OrderedDict[str, float]" = OrderedDict()
+_recent_lock = threading.Lock()
+
+
+def sticky_key(request: Request) -> str:
+    """Clientul cererii: tokenul (rezumat, nu il tinem in memorie) sau IP-ul pentru cereri anonime"""
+    header = request.headers.get("authorization")
+    if header:
+        return "t:" + hashlib.blake2b(header.encode(), digest_size=12).hexdigest()
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+def mark_write(key: str):
+    if not replicas or DB_READ_YOUR_WRITES_SECONDS <= 0:
+        return
+    with _recent_lock:
+        _recent_writes[key] = time.monotonic() + DB_READ_YOUR_WRITES_SECONDS
+        _recent_writes.move_to_end(key)
+        while len(_recent_writes) > DB_STICKY_MAX_KEYS:
+            _recent_writes.popitem(last=False)
+
+
+def _wrote_recently(key: str) -> bool:
+    until = _recent_writes.get(key)
+    return until is not None and until > time.monotonic()
+
+
+def _replica_lag(conn) -> float:
+    if conn.dialect.name != "postgresql":
+        conn.exec_driver_sql("SELECT 1")
+        return 0.0
+    # 0 daca replica a aplicat tot ce a primit (sau e chiar primarul); altfel vechimea ultimei tranzactii aplicate
+    lag = conn.exec_driver_sql(
+        "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+        "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    ).scalar()
+    return float(lag or 0)
+
+
+def check_replicas():
+    for replica in replicas:
+        try:
+            with replica.engine.connect() as conn:
+                replica.lag_seconds = _replica_lag(conn)
+        except Exception as e:
+            replica.lag_seconds = None
+            replica.eject(f"{type(e).__name__}: {getattr(e, 'orig', e)}")
+            replica.engine.dispose()
+            continue
+        if replica.lag_seconds > DB_REPLICA_MAX_LAG_SECONDS:
+            replica.eject(f"lag {replica.lag_seconds:.1f}s")
+        elif not replica.healthy:
+            logger.info("DB replica %s back in rotation", replica.name)
+            replica.ejected_until = 0.0
+
+
+_replica_check_started = False
+
+def start_replica_healthcheck():
+    global _replica_check_started
+    if not replicas or DB_REPLICA_HEALTHCHECK_INTERVAL <= 0 or _replica_check_started:
+        return
+    _replica_check_started = True
+
+    def loop():
+        while True:
+            time.sleep(DB_REPLICA_HEALTHCHECK_INTERVAL)
+            check_replicas()
+
+    threading.Thread(target=loop, name="db-replica-healthcheck", daemon=True).start()
+
+
+def pool_status() -> dict:
+    pool = engine.pool
+    return {
+        "config": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pre_ping": DB_POOL_PRE_PING,
+            "healthcheck_interval": DB_POOL_HEALTHCHECK_INTERVAL,
+        },
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "checkouts": pool_metrics.checkouts,
+        "checkins": pool_metrics.checkins,
+        "connects": pool_metrics.connects,
+        "timeouts": pool_metrics.timeouts,
+        "healthcheck_failures": pool_metrics.healthcheck_failures,
+        "wait_time_seconds": pool_metrics.wait_time.snapshot(),
+        "replicas": [r.status() for r in replicas],
+    }
+
+_healthcheck_started = False
+
+def start_pool_healthcheck():
+    """Porneste (o singura data) verificarea periodica a conexiunilor, daca e configurata"""
+    global _healthcheck_started
+    if DB_POOL_HEALTHCHECK_INTERVAL <= 0 or _healthcheck_started:
+        return
+    _healthcheck_started = True
+
+    def loop():
+        while True:
+            time.sleep(DB_POOL_HEALTHCHECK_INTERVAL)
+            try:
+                with engine.connect() as conn:
+                    conn.exec_driver_sql("SELECT 1")
+            except Exception:
+                # Conexiunile din pool sunt probabil moarte (ex. restart Postgres): le aruncam
+                pool_metrics.healthcheck_failures += 1
+                logger.warning("DB pool healthcheck failed, disposing pool", exc_info=True)
+                engine.dispose()
+
+    threading.Thread(target=loop, name="db-pool-healthcheck", daemon=True).start()
+
+def dialect_insert(table):
+    """INSERT specific dialectului (suporta ON CONFLICT): Postgres in productie, SQLite local"""
+    if engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(table)
 
 # Factory pentru sesiuni
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# Scrierile din sesiunile primare marcheaza clientul (la commit, inainte de raspuns);
+# sesiunile de citire refuza flush-ul: pe un replica ar esua oricum
+@event.listens_for(Session, "before_flush")
+def _before_flush(session, flush_context, instances):
+    if session.info.get("read_only"):
+        raise RuntimeError("write attempted on a read-only session (use get_db)")
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    if session.info.pop("wrote", False) and "sticky_key" in session.info:
+        mark_write(session.info["sticky_key"])
+
 # Dependency pentru FastAPI (yield session)
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
+    db.info["sticky_key"] = sticky_key(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def read_session(*keys: str) -> Session:
+    """
+    Sesiune doar pentru citire: pe un replica sanatos (round-robin), sau pe primar daca
+    nu sunt replici, toate sunt scoase din rotatie ori una din chei a scris recent.
+    """
+    if replicas:
+        if any(_wrote_recently(k) for k in keys):
+            db_reads.labels("primary_sticky").inc()
+        else:
+            for replica in _candidates():
+                db = SessionLocal(bind=replica.engine, info={"read_only": True})
+                try:
+                    # Conexiunea se ia acum: un replica cazut cade pe urmatorul, nu in mijlocul rutei
+                    db.connection()
+                except OperationalError as e:
+                    db.close()
+                    replica.eject(f"{type(e).__name__}: {getattr(e, 'orig', e)}")
+                    continue
+                db_reads.labels(replica.name).inc()
+                return db
+            db_reads.labels("primary").inc()
+    return SessionLocal(info={"read_only": True})
+
+# Dependency pentru rutele de citire
+def get_read_db(request: Request):
+    db = read_session(sticky_key(request))
     try:
         yield db
     finally:
         db.close()
+
+# Engine async: creat doar cand DB_ASYNC=true (asyncpg nu e necesar altfel)
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    # aiosqlite (rulari locale) foloseste NullPool, care nu accepta parametri de dimensionare
+    pool_kwargs = {} if ASYNC_DATABASE_URL.startswith("sqlite") else {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        **pool_kwargs,
+    )
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,55 @@
+from typing import Any, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from .models import Message, User
+from .pagination import apply_cursor, encode_cursor
+from .schemas import MessageAuthor, MessageOut, MessagesPage
+
+
+def messages_stmt(discussion_id: int, before: Optional[str], after: Optional[str], limit: int):
+    """Pagina de mesaje dintr-o discutie; foloseste indexul (discussion_id, created_at, id)"""
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    stmt = (
+        select(Message, User.username)
+        .join(User, User.id == Message.author_id)
+        .where(Message.discussion_id == discussion_id)
+    )
+    if after:
+        return apply_cursor(stmt, Message.created_at, Message.id, after, limit, after=True)
+    return apply_cursor(stmt, Message.created_at, Message.id, before, limit)
+
+
+def messages_page(rows: List[Any], limit: int, before: Optional[str], after: Optional[str], compact: bool) -> MessagesPage:
+    """Construieste raspunsul; mesajele sunt mereu in ordine cronologica"""
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if not after:
+        rows.reverse()
+
+    items, authors = [], {}
+    for m, username in rows:
+        author = MessageAuthor(id=m.author_id, username=username)
+        if compact:
+            authors[m.author_id] = author
+        items.append(MessageOut(
+            id=m.id,
+            discussion_id=m.discussion_id,
+            author_id=m.author_id,
+            body=m.body,
+            created_at=m.created_at,
+            author=None if compact else author,
+        ))
+
+    page = MessagesPage(
+        items=items,
+        authors=authors if compact else None,
+        has_older=more if not after else True,
+        has_newer=more if after else bool(before),
+    )
+    if items:
+        page.before_cursor = encode_cursor(items[0].created_at, items[0].id)
+        page.after_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return page
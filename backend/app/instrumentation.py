@@ -0,0 +1,140 @@
+import logging
+import os
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from sqlalchemy import event
+
+from .db import engine, async_engine, replicas, pool_status
+from .metrics import Family, COLLECTORS
+
+logger = logging.getLogger("uvicorn.error")
+
+# 0 = dezactivat; altfel cererile mai lente de atat sunt logate impreuna cu SQL-ul emis
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+
+# === Metrici ===
+request_latency = Family(
+    "http_request_duration_seconds", "Durata cererilor HTTP", "histogram", ("method", "route"))
+requests_total = Family(
+    "http_requests_total", "Cereri HTTP dupa status", "counter", ("method", "route", "status"))
+request_db_time = Family(
+    "http_request_db_seconds", "Timp petrecut in SQL per cerere", "histogram", ("method", "route"))
+request_queries = Family(
+    "http_request_db_queries", "Numar de query-uri SQL per cerere", "histogram", ("method", "route"),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200))
+minio_latency = Family(
+    "minio_operation_duration_seconds", "Durata apelurilor MinIO", "histogram", ("operation",))
+
+
+# === Statistici per cerere ===
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_time: float = 0.0
+    minio_time: float = 0.0
+    statements: Optional[List[str]] = field(default=None)
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    # Rutele sync ruleaza in threadpool: contextul (si obiectul RequestStats) e copiat acolo
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    stats.db_time += elapsed
+    if stats.statements is not None and len(stats.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.statements.append(statement)
+
+for _engine in filter(None, (engine, async_engine and async_engine.sync_engine, *(r.engine for r in replicas))):
+    event.listen(_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def minio_timer(operation: str):
+    """with minio_timer("put_object"): minio_client.put_object(...)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        minio_latency.labels(operation).observe(elapsed)
+        stats = _current.get()
+        if stats is not None:
+            stats.minio_time += elapsed
+
+
+# === Middleware ASGI (masoara si corpul raspunsurilor streaming, spre deosebire de BaseHTTPMiddleware) ===
+class InstrumentationMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._routes = None
+
+    def _route_label(self, scope) -> str:
+        # Sablonul rutei (/files/{file_id}/content), nu calea concreta: cardinalitate limitata
+        if self._routes is None:
+            self._routes = {r.endpoint: r.path for r in scope["app"].routes if hasattr(r, "endpoint")}
+        return self._routes.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(statements=[] if SLOW_REQUEST_MS else None)
+        token = _current.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            method, route = scope["method"], self._route_label(scope)
+            request_latency.labels(method, route).observe(elapsed)
+            requests_total.labels(method, route, str(status_code)).inc()
+            request_db_time.labels(method, route).observe(stats.db_time)
+            request_queries.labels(method, route).observe(stats.queries)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                _log_slow(method, scope["path"], status_code, elapsed, stats)
+
+
+def _log_slow(method: str, path: str, status_code: int, elapsed: float, stats: RequestStats):
+    # Acelasi SQL repetat de multe ori intr-o cerere = N+1; apar primele
+    tally = _Tally(stats.statements)
+    lines = [
+        f"slow request {method} {path} -> {status_code}: {elapsed * 1000:.0f}ms, "
+        f"{stats.queries} queries / {stats.db_time * 1000:.0f}ms SQL, {stats.minio_time * 1000:.0f}ms MinIO"
+    ]
+    lines += [f"  x{n} {' '.join(sql.split())[:300]}" for sql, n in tally.most_common()]
+    logger.warning("\n".join(lines))
+
+
+def _pool_gauges() -> List[str]:
+    s = pool_status()
+    lines = []
+    for key in ("size", "checked_out", "checked_in", "overflow"):
+        lines += [f"# TYPE db_pool_{key} gauge", f"db_pool_{key} {s[key]}"]
+    for key in ("checkouts", "connects", "timeouts"):
+        lines += [f"# TYPE db_pool_{key}_total counter", f"db_pool_{key}_total {s[key]}"]
+    return lines
+
+COLLECTORS.append(_pool_gauges)
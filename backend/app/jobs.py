@@ -0,0 +1,124 @@
+import os
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .models import Job, File as FileModel
+
+# Coada durabila in tabela jobs. Joburile se adauga in aceeasi tranzactie cu randul File
+# (nu se pierd daca procesul moare dupa commit); app.worker le preia cu SKIP LOCKED.
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+# Un job "running" mai vechi de atat apartine unui worker mort si e repus in coada
+JOB_LOCK_TIMEOUT = int(os.getenv("JOB_LOCK_TIMEOUT", "600"))
+
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp", "bmp", "tiff"}
+TEXT_EXTENSIONS = {"pdf", "docx", "txt", "md", "csv"}
+
+# Coloana din File completata de fiecare tip de job si numele artefactului in MinIO
+OUTPUTS = {
+    "thumbnail": ("thumbnail_object", "thumbnail.jpg", "image/jpeg"),
+    "extract_text": ("text_object", "text.txt", "text/plain; charset=utf-8"),
+}
+
+
+def kinds_for(filename: str, content_type: Optional[str]) -> List[str]:
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    kinds = []
+    if ext in IMAGE_EXTENSIONS or (content_type or "").startswith("image/"):
+        kinds.append("thumbnail")
+    if ext in TEXT_EXTENSIONS or content_type in ("application/pdf", "text/plain", "text/markdown"):
+        kinds.append("extract_text")
+    return kinds
+
+
+def enqueue_for_file(db: Session, rec: FileModel, content_type: Optional[str] = None):
+    """Adauga joburile de procesare pentru un fisier nou; apelantul face commit"""
+    kinds = kinds_for(rec.filename, content_type)
+    if not kinds:
+        return
+    if rec.id is None:
+        db.flush()
+    for kind in kinds:
+        db.add(Job(kind=kind, file_id=rec.id, max_attempts=JOB_MAX_ATTEMPTS))
+
+
+def derived_key(rec) -> str:
+    # Pe continut cand exista sha256: fisierele deduplicate impart si artefactele
+    return f"derived/{rec.sha256}" if rec.sha256 else f"derived/f{rec.id}"
+
+
+# === Partea de worker ===
+def claim(worker_id: str, limit: int) -> list:
+    """Preia pana la `limit` joburi scadente; doi workeri nu primesc niciodata acelasi job"""
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        stale = now - timedelta(seconds=JOB_LOCK_TIMEOUT)
+        db.execute(
+            update(Job).where(Job.status == "running", Job.locked_at < stale, Job.attempts >= Job.max_attempts)
+            .values(status="failed", last_error="worker lost while running the job")
+        )
+        db.execute(
+            update(Job).where(Job.status == "running", Job.locked_at < stale).values(status="queued", run_after=now)
+        )
+
+        ids = db.execute(
+            select(Job.id)
+            .where(Job.status == "queued", Job.run_after <= now)
+            .order_by(Job.run_after, Job.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not ids:
+            db.commit()
+            return []
+        db.execute(
+            update(Job).where(Job.id.in_(ids))
+            .values(status="running", locked_at=now, locked_by=worker_id, attempts=Job.attempts + 1)
+        )
+        rows = db.execute(
+            select(
+                Job.id, Job.kind, Job.attempts, Job.max_attempts, Job.file_id,
+                FileModel.object_name, FileModel.filename, FileModel.sha256, FileModel.size,
+            )
+            .outerjoin(FileModel, FileModel.id == Job.file_id)
+            .where(Job.id.in_(ids))
+        ).all()
+        db.commit()
+        return rows
+
+
+def complete(job, output_object: Optional[str]):
+    """Marcheaza jobul ca terminat si leaga artefactul de randul File (si de copiile deduplicate)"""
+    with SessionLocal() as db:
+        if output_object:
+            column = OUTPUTS[job.kind][0]
+            target = FileModel.sha256 == job.sha256 if job.sha256 else FileModel.id == job.file_id
+            db.execute(update(FileModel).where(target).values({column: output_object}))
+        db.execute(update(Job).where(Job.id == job.id).values(status="done", locked_at=None, last_error=None))
+        db.commit()
+
+
+def fail(job, error: str, permanent: bool = False):
+    """Reincercare cu backoff exponential (si jitter) sau esec definitiv"""
+    with SessionLocal() as db:
+        if permanent or job.attempts >= job.max_attempts:
+            values = {"status": "failed"}
+        else:
+            delay = min(JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1), JOB_RETRY_MAX_SECONDS)
+            values = {"status": "queued", "run_after": datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.8, 1.2))}
+        db.execute(update(Job).where(Job.id == job.id).values(locked_at=None, last_error=error[:2000], **values))
+        db.commit()
+
+
+def stats(db: Session) -> dict:
+    counts = {}
+    for kind, status, n in db.execute(select(Job.kind, Job.status, func.count()).group_by(Job.kind, Job.status)):
+        counts.setdefault(kind, {})[status] = n
+    return counts
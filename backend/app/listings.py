@@ -0,0 +1,28 @@
+from typing import Optional
+
+from sqlalchemy import select
+
+from .models import Post, File as FileModel
+from .pagination import apply_cursor, page_from_rows
+from .serialization import dumps, rows_as_dicts
+
+# Liste mari selectate ca randuri de coloane si serializate direct (vezi serialization.py)
+
+# Campurile din PostOut; created_at e selectat doar pentru cursor
+POST_FIELDS = ("id", "title", "content", "is_public", "author_id")
+FILE_FIELDS = ("id", "owner_id", "object_name", "filename", "size", "sha256", "created_at")
+
+
+def public_posts_stmt(cursor: Optional[str], limit: int):
+    stmt = select(*(getattr(Post, f) for f in POST_FIELDS), Post.created_at).where(Post.is_public == True)
+    return apply_cursor(stmt, Post.created_at, Post.id, cursor, limit)
+
+
+def posts_page_json(rows, limit: int) -> bytes:
+    """Corpul PostsPage, serializat direct din randuri"""
+    items, next_cursor = page_from_rows(rows, limit)
+    return dumps({"items": rows_as_dicts(items, POST_FIELDS), "next_cursor": next_cursor})
+
+
+def files_stmt(owner_id: int):
+    return select(*(getattr(FileModel, f) for f in FILE_FIELDS)).where(FileModel.owner_id == owner_id)
@@ -1,28 +1,70 @@
+import hmac
+import ipaddress
 import os
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
+import uuid
+from datetime import timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
-from minio import Minio
 from minio.error import S3Error
 
-from .db import get_db, engine
-from .models import Base, User, Role, Post, File as FileModel, Discussion, Message, Status
+from .db import get_db, get_read_db, read_session, mark_write, sticky_key, engine, DB_ASYNC, pool_status
+from .models import User, Role, Post, File as FileModel, Discussion, Message, Status, Job
 from .schemas import (
-    UserCreate, UserOut, Token, PostCreate, PostOut,
-    DiscussionCreate, MessageCreate, StatusCreate
+    UserCreate, UserOut, Token, PostCreate, PostOut, PostsPage,
+    DiscussionCreate, MessageCreate, MessagesPage, StatusCreate, PresignedUrlOut, FileByHashIn, StorageUsageOut,
+    FileByHashChallengeIn, FileByHashChallengeOut,
+    FileDerivedOut, JobOut
+)
+from .auth import (
+    Principal, create_access_token, get_current_user,
+    invalidate_principal, principal_cache
 )
-from .auth import get_password_hash, verify_password, create_access_token, get_current_user
 from .deps import is_admin
+from . import passwords
+from .discussions import messages_stmt, messages_page
+from .counting import invalidate_counts
+from .storage import (
+    minio_client, presign_client, MINIO_BUCKET, PRESIGN_EXPIRE_SECONDS,
+    DOWNLOAD_CHUNK_SIZE, parse_range
+)
 
-from .routers import admin
+from .startup import lifespan
+from . import startup
+from .routers import admin, uploads, async_api, realtime, search
+from . import pubsub
+from . import response_cache
+from . import blobs
+from .listings import public_posts_stmt, posts_page_json, files_stmt, FILE_FIELDS
+from .serialization import FastJSONResponse, rows_as_dicts
+from . import ratelimit
+from . import usage
+from . import jobs
+from .instrumentation import InstrumentationMiddleware, minio_timer
+from .compression import CompressionMiddleware
+from .metrics import render_prometheus
 
 
 # === App init ===
-app = FastAPI(title="Hub Studenti API")
+# Initializarea (schema, roluri, bucket MinIO) ruleaza in lifespan, nu la import
+app = FastAPI(title="Hub Studenti API", lifespan=lifespan)
+if DB_ASYNC:
+    # Variantele async ale rutelor fierbinti, inregistrate primele => au prioritate
+    app.include_router(async_api.router)
 app.include_router(admin.router)
+app.include_router(uploads.router)
+app.include_router(realtime.router)
+app.include_router(search.router)
 
 # CORS (pentru frontend dev)
+# Scrierile sunt respinse primele cand workerul e saturat (in interiorul CORS: 503 ajunge la browser)
+app.add_middleware(ratelimit.AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -30,66 +72,109 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-# Creare tabele
-Base.metadata.create_all(bind=engine)
-
-# Seed roluri default
-from sqlalchemy import select
-with next(get_db()) as db:
-    for name in ["guest", "user", "admin"]:
-        if not db.query(Role).filter(Role.name == name).first():
-            db.add(Role(name=name))
-    db.commit()
-
-# MinIO client setup
-MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "minio:9000")
-MINIO_ROOT_USER = os.getenv("MINIO_ROOT_USER", "minioadmin")
-MINIO_ROOT_PASSWORD = os.getenv("MINIO_ROOT_PASSWORD", "minioadmin")
-MINIO_BUCKET = os.getenv("MINIO_BUCKET", "materials")
-MINIO_SECURE = os.getenv("MINIO_SECURE", "false").lower() == "true"
-
-minio_client = Minio(
-    MINIO_ENDPOINT,
-    access_key=MINIO_ROOT_USER,
-    secret_key=MINIO_ROOT_PASSWORD,
-    secure=MINIO_SECURE,
-)
-try:
-    if not minio_client.bucket_exists(MINIO_BUCKET):
-        minio_client.make_bucket(MINIO_BUCKET)
-except S3Error:
-    pass
+# Comprimare/MessagePack pe raspunsul final (inclusiv 503 si headerele CORS)
+app.add_middleware(CompressionMiddleware)
+# Ultimul adaugat = cel mai din exterior: masoara si timpul petrecut in CORS si in comprimare
+app.add_middleware(InstrumentationMiddleware)
 
 # === Health check ===
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+# === Metrici Prometheus (scrape direct pe backend:8000, blocat in nginx) ===
+# Portul 8000 e publicat: cu METRICS_TOKEN scrape-ul trimite "Authorization: Bearer <token>",
+# fara token ruta raspunde doar pe loopback
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+def _metrics_allowed(request: Request) -> bool:
+    if METRICS_TOKEN:
+        header = request.headers.get("authorization", "")
+        return hmac.compare_digest(header.encode(), f"Bearer {METRICS_TOKEN}".encode())
+    try:
+        return ipaddress.ip_address(request.client.host).is_loopback
+    except (AttributeError, ValueError):
+        return False
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    if not _metrics_allowed(request):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# === Readiness: DB si storage initializate si accesibile ===
+@app.get("/ready")
+def ready():
+    checks = {"db": startup.state["db"], "storage": startup.state["storage"]}
+    if checks["db"]:
+        try:
+            with engine.connect() as conn:
+                conn.exec_driver_sql("SELECT 1")
+        except Exception:
+            checks["db"] = False
+    if not checks["storage"]:
+        startup.init_storage()
+        checks["storage"] = startup.state["storage"]
+    body = {"status": "ready" if all(checks.values()) else "not_ready", **checks, "startup": startup.state["timings"]}
+    return JSONResponse(body, status_code=200 if all(checks.values()) else 503)
+
 # === Auth ===
-@app.post("/auth/register", response_model=UserOut)
-def register(payload: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter((User.username == payload.username) | (User.email == payload.email)).first():
-        raise HTTPException(status_code=400, detail="User already exists")
-    user = User(email=payload.email, username=payload.username, password_hash=get_password_hash(payload.password))
+# Rutele sunt async: asteptarea bcrypt (pool de procese) nu ocupa un thread din threadpool-ul comun;
+# doar query-urile scurte ruleaza in threadpool
+def _user_exists(db: Session, payload: UserCreate) -> bool:
+    return db.query(User.id).filter((User.username == payload.username) | (User.email == payload.email)).first() is not None
+
+def _create_user(db: Session, payload: UserCreate, password_hash: str) -> UserOut:
+    user = User(email=payload.email, username=payload.username, password_hash=password_hash)
     role_user = db.query(Role).filter(Role.name == "user").first()
     user.roles.append(role_user)
     db.add(user)
     db.commit()
+    invalidate_counts("users")
     db.refresh(user)
     return UserOut(id=user.id, email=user.email, username=user.username, roles=[r.name for r in user.roles])
 
-@app.post("/auth/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+def _find_user(db: Session, username: str):
+    # Randul de coloane (nu obiect ORM) ramane valid dupa rollback
+    user = db.execute(
+        select(User.id, User.username, User.password_hash).where(User.username == username)
+    ).first()
+    # Conexiunea nu ramane ocupata cat asteptam bcrypt
+    db.rollback()
+    return user
+
+def _update_hash(db: Session, user_id: int, new_hash: str):
+    db.execute(update(User).where(User.id == user_id).values(password_hash=new_hash))
+    db.commit()
+
+@app.post("/auth/register", response_model=UserOut, dependencies=[Depends(ratelimit.rate_limit("register"))])
+async def register(payload: UserCreate, db: Session = Depends(get_db)):
+    if await run_in_threadpool(_user_exists, db, payload):
+        raise HTTPException(status_code=400, detail="User already exists")
+    password_hash = await passwords.hash_password_async(payload.password)
+    return await run_in_threadpool(_create_user, db, payload, password_hash)
+
+@app.post("/auth/login", response_model=Token, dependencies=[Depends(ratelimit.login_limit)])
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_find_user, db, form_data.username)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    ok, new_hash = await passwords.verify_and_update_async(form_data.password, user.password_hash)
+    if not ok:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Cost bcrypt schimbat: refacem hash-ul transparent
+        await run_in_threadpool(_update_hash, db, user.id, new_hash)
     token = create_access_token({"sub": user.username})
     return Token(access_token=token)
 
 @app.get("/users/me", response_model=UserOut)
-def me(user: User = Depends(get_current_user)):
-    return UserOut(id=user.id, email=user.email, username=user.username, roles=[r.name for r in user.roles])
+def me(user: Principal = Depends(get_current_user)):
+    return UserOut(id=user.id, email=user.email, username=user.username, roles=list(user.roles))
+
+@app.get("/users/me/storage", response_model=StorageUsageOut)
+def my_storage(db: Session = Depends(get_read_db), user: Principal = Depends(get_current_user)):
+    return usage.get(db, user.id)
 
 # === Admin: role assignment ===
 @app.post("/admin/users/{user_id}/roles/{role}")
@@ -101,60 +186,264 @@ def assign_role(user_id: int, role: str, db: Session = Depends(get_db), _=Depend
     if r not in u.roles:
         u.roles.append(r)
         db.commit()
+        invalidate_principal(u.username)
     return {"ok": True}
 
+@app.get("/admin/cache/principals")
+def principal_cache_stats(_=Depends(is_admin)):
+    return principal_cache.stats()
+
+@app.get("/admin/cache/responses")
+def response_cache_stats(_=Depends(is_admin)):
+    return response_cache.stats()
+
+@app.get("/admin/jobs")
+def job_stats(_=Depends(is_admin), db: Session = Depends(get_db)):
+    return jobs.stats(db)
+
+@app.get("/admin/rate-limits")
+def rate_limit_stats(_=Depends(is_admin)):
+    return ratelimit.stats()
+
+@app.get("/admin/password-pool")
+def password_pool_stats(_=Depends(is_admin)):
+    return passwords.pool_stats()
+
+@app.get("/admin/realtime")
+def realtime_stats(_=Depends(is_admin)):
+    return pubsub.hub.stats()
+
+@app.get("/admin/db/pool")
+def db_pool_stats(_=Depends(is_admin)):
+    return pool_status()
+
 # === Blog posts ===
-@app.post("/posts", response_model=PostOut)
-def create_post(payload: PostCreate, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+@app.post("/posts", response_model=PostOut, dependencies=[Depends(ratelimit.rate_limit("write"))])
+def create_post(payload: PostCreate, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
     p = Post(author_id=user.id, title=payload.title, content=payload.content, is_public=payload.is_public)
     db.add(p)
     db.commit()
     db.refresh(p)
+    if p.is_public:
+        response_cache.invalidate("posts")
+        # Feed-ul golit din cache nu se reumple de pe un replica inca in urma
+        mark_write("posts")
     return p
 
-@app.get("/posts", response_model=list[PostOut])
-def list_posts(db: Session = Depends(get_db)):
-    return db.query(Post).filter(Post.is_public == True).order_by(Post.created_at.desc()).all()
+@app.get("/posts", response_model=PostsPage)
+def list_posts(
+    request: Request,
+    cursor: Optional[str] = Query(None, description="next_cursor din pagina anterioara"),
+    limit: int = Query(20, ge=1, le=100),
+):
+    # Feed-ul public e identic pentru toti: corp serializat o data, servit din cache pana la urmatorul post
+    key = response_cache.cache_key(request, "posts")
+    entry = response_cache.lookup(key)
+    if entry is None:
+        with read_session("posts", sticky_key(request)) as db:
+            # Paginare keyset pe (created_at, id): costul unei pagini nu depinde de adancime
+            rows = db.execute(public_posts_stmt(cursor, limit)).all()
+        entry = response_cache.store(key, posts_page_json(rows, limit))
+    return response_cache.respond(request, entry)
 
 # === Files (Drive) ===
-@app.post("/files/upload")
-def upload_file(f: UploadFile = File(...), db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    object_name = f"u{user.id}/" + f.filename
+@app.post("/files/upload", dependencies=[Depends(ratelimit.rate_limit("upload"))])
+def upload_file(f: UploadFile = File(...), db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
     data = f.file
     size = 0
     data.seek(0, 2)
     size = data.tell()
     data.seek(0)
-    minio_client.put_object(MINIO_BUCKET, object_name, data, size, content_type=f.content_type)
-    rec = FileModel(owner_id=user.id, object_name=object_name, filename=f.filename, size=size)
+    # Cota verificata inainte ca vreun byte sa plece spre MinIO
+    usage.check_quota(db, user.id, size)
+    # Hash-ul se calculeaza in aceeasi trecere cu upload-ul; cheia finala depinde de continut
+    reader = blobs.HashingReader(data)
+    tmp_object = f"tmp/{uuid.uuid4().hex}"
+    with minio_timer("put_object"):
+        minio_client.put_object(MINIO_BUCKET, tmp_object, reader, size, content_type=f.content_type)
+    sha256 = reader.hexdigest()
+    with minio_timer("copy_object"):
+        object_name, new = blobs.store(db, tmp_object, sha256, size, f.content_type)
+    rec = FileModel(owner_id=user.id, object_name=object_name, filename=f.filename, size=size, sha256=sha256)
     db.add(rec)
+    usage.add(db, user.id, size, 1)
+    # Thumbnail / text extras: produse de app.worker dupa commit, nu in cerere
+    jobs.enqueue_for_file(db, rec, f.content_type)
     db.commit()
-    return {"ok": True, "object": object_name}
+    invalidate_counts("files")
+    return {"ok": True, "object": object_name, "sha256": sha256, "deduplicated": not new}
+
+@app.post("/files/by-hash/challenge", response_model=FileByHashChallengeOut,
+          dependencies=[Depends(ratelimit.rate_limit("upload"))])
+def file_by_hash_challenge(payload: FileByHashChallengeIn, user: Principal = Depends(get_current_user)):
+    """Intervalul de octeti pe care clientul il dovedeste la /files/by-hash (identic pentru continut necunoscut)"""
+    return blobs.challenge(user.id, payload.sha256, payload.size)
+
+@app.post("/files/by-hash", dependencies=[Depends(ratelimit.rate_limit("upload"))])
+def upload_file_by_hash(payload: FileByHashIn, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
+    """
+    Continut deja stocat: clientul trimite sha256 si dovada de posesie (challenge), fara bytes.
+    404 => upload normal; acelasi raspuns pentru continut necunoscut si dovada gresita.
+    """
+    unknown = HTTPException(status_code=404, detail="Unknown content, upload the file")
+    if not blobs.possesses(db, user.id, payload.sha256, payload.size, payload.challenge, payload.proof):
+        raise unknown
+    blob = blobs.reference(db, payload.sha256)
+    if not blob:
+        raise unknown
+    usage.check_quota(db, user.id, blob.size)
+    rec = FileModel(
+        owner_id=user.id, object_name=blob.object_name, filename=payload.filename, size=blob.size,
+        sha256=payload.sha256,
+    )
+    db.add(rec)
+    usage.add(db, user.id, blob.size, 1)
+    jobs.enqueue_for_file(db, rec)
+    db.commit()
+    invalidate_counts("files")
+    return {"ok": True, "object": blob.object_name, "sha256": payload.sha256, "deduplicated": True}
+
+@app.get("/files", response_class=FastJSONResponse)
+def list_files(db: Session = Depends(get_read_db), user: Principal = Depends(get_current_user)):
+    rows = db.execute(files_stmt(user.id)).all()
+    return FastJSONResponse(rows_as_dicts(rows, FILE_FIELDS))
 
-@app.get("/files")
-def list_files(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    return db.query(FileModel).filter(FileModel.owner_id == user.id).all()
+@app.get("/files/{file_id}/derived", response_model=FileDerivedOut)
+def file_derived(file_id: int, db: Session = Depends(get_read_db), user: Principal = Depends(get_current_user)):
+    """Artefactele produse in fundal (URL-uri presemnate cand sunt gata) si starea joburilor"""
+    rec = db.query(FileModel).filter(FileModel.id == file_id, FileModel.owner_id == user.id).first()
+    if not rec:
+        raise HTTPException(status_code=404, detail="File not found")
+    expires = timedelta(seconds=PRESIGN_EXPIRE_SECONDS)
+    rows = db.execute(
+        select(Job.kind, Job.status, Job.attempts, Job.last_error).where(Job.file_id == file_id).order_by(Job.id)
+    ).all()
+    return FileDerivedOut(
+        thumbnail_url=presign_client.presigned_get_object(MINIO_BUCKET, rec.thumbnail_object, expires=expires)
+        if rec.thumbnail_object else None,
+        text_url=presign_client.presigned_get_object(MINIO_BUCKET, rec.text_object, expires=expires)
+        if rec.text_object else None,
+        jobs=[JobOut(**r._mapping) for r in rows],
+    )
+
+@app.get("/files/{file_id}/download-url", response_model=PresignedUrlOut)
+def file_download_url(file_id: int, db: Session = Depends(get_read_db), user: Principal = Depends(get_current_user)):
+    rec = db.query(FileModel).filter(FileModel.id == file_id, FileModel.owner_id == user.id).first()
+    if not rec:
+        raise HTTPException(status_code=404, detail="File not found")
+    url = presign_client.presigned_get_object(
+        MINIO_BUCKET,
+        rec.object_name,
+        expires=timedelta(seconds=PRESIGN_EXPIRE_SECONDS),
+        response_headers={"response-content-disposition": f'attachment; filename="{rec.filename}"'},
+    )
+    return PresignedUrlOut(url=url, object_name=rec.object_name, expires_in=PRESIGN_EXPIRE_SECONDS)
+
+@app.get("/files/{file_id}/content")
+def file_content(
+    file_id: int, request: Request, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)
+):
+    rec = db.query(FileModel).filter(FileModel.owner_id == user.id, FileModel.id == file_id).first()
+    if not rec:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    try:
+        stat = minio_client.stat_object(MINIO_BUCKET, rec.object_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            raise HTTPException(status_code=404, detail="File content missing")
+        raise
+    etag = f'"{stat.etag}"'
+    last_modified = format_datetime(stat.last_modified, usegmt=True)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{rec.filename}"',
+    }
+
+    # GET conditional: If-None-Match are prioritate fata de If-Modified-Since
+    inm = request.headers.get("if-none-match")
+    ims = request.headers.get("if-modified-since")
+    if inm is not None:
+        if inm.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in inm.split(",")]:
+            return Response(status_code=304, headers=headers)
+    elif ims is not None:
+        try:
+            if stat.last_modified.replace(microsecond=0) <= parsedate_to_datetime(ims):
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    size = stat.size
+    start, end, status_code = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() in (etag, last_modified)):
+        try:
+            rng = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if rng:
+            start, end = rng
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    if size == 0:
+        return Response(status_code=200, headers=headers, media_type=stat.content_type)
+
+    obj = minio_client.get_object(MINIO_BUCKET, rec.object_name, offset=start, length=end - start + 1)
+
+    def body():
+        try:
+            yield from obj.stream(DOWNLOAD_CHUNK_SIZE)
+        finally:
+            obj.close()
+            obj.release_conn()
+
+    return StreamingResponse(body(), status_code=status_code, headers=headers, media_type=stat.content_type)
 
 # === Discussions ===
-@app.post("/discussions")
-def create_discussion(payload: DiscussionCreate, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+@app.post("/discussions", dependencies=[Depends(ratelimit.rate_limit("write"))])
+def create_discussion(payload: DiscussionCreate, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
     d = Discussion(title=payload.title, created_by=user.id)
     db.add(d)
     db.commit()
     db.refresh(d)
     return d
 
-@app.post("/messages")
-def post_message(payload: MessageCreate, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+@app.post("/messages", dependencies=[Depends(ratelimit.rate_limit("write"))])
+def post_message(payload: MessageCreate, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
     m = Message(discussion_id=payload.discussion_id, author_id=user.id, body=payload.body)
     db.add(m)
+    db.flush()
+    event = pubsub.message_payload(m, user.username)
+    if pubsub.REALTIME_PG_NOTIFY:
+        db.execute(pubsub.notify_sql(m.discussion_id, event))
     db.commit()
+    pubsub.publish(m.discussion_id, event)
     db.refresh(m)
     return m
 
+@app.get("/discussions/{discussion_id}/messages", response_model=MessagesPage, response_model_exclude_none=True)
+def list_messages(
+    discussion_id: int,
+    before: Optional[str] = Query(None, description="before_cursor: mesaje mai vechi"),
+    after: Optional[str] = Query(None, description="after_cursor: mesaje mai noi"),
+    limit: int = Query(50, ge=1, le=200),
+    compact: bool = Query(False, description="autorii o singura data, in 'authors'"),
+    db: Session = Depends(get_read_db),
+    user: Principal = Depends(get_current_user),
+):
+    if not db.get(Discussion, discussion_id):
+        raise HTTPException(status_code=404, detail="Discussion not found")
+    rows = db.execute(messages_stmt(discussion_id, before, after, limit)).all()
+    return messages_page(list(rows), limit, before, after, compact)
+
 # === Status ===
-@app.post("/status")
-def set_status(payload: StatusCreate, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+@app.post("/status", dependencies=[Depends(ratelimit.rate_limit("write"))])
+def set_status(payload: StatusCreate, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
     s = Status(user_id=user.id, text=payload.text)
     db.add(s)
     db.commit()
@@ -0,0 +1,100 @@
+import bisect
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Limite implicite (secunde) pentru histogramele de durata
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Histograma cumulativa simpla (stil Prometheus), thread-safe"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets: List[float] = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # ultimul = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, total = {}, 0
+            for le, n in zip([*map(str, self.buckets), "+Inf"], self.counts):
+                total += n
+                cumulative[le] = total
+            return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Family:
+    """Metrica cu etichete (ex. method, route): un Histogram/Counter per combinatie de valori"""
+
+    def __init__(self, name: str, help: str, kind: str, labelnames: Sequence[str], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.kind = kind  # "histogram" | "counter"
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = Histogram(self.buckets) if self.kind == "histogram" else Counter()
+                    self._children[values] = child
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values))
+            if self.kind == "counter":
+                lines.append(f"{self.name}{{{labels}}} {child.value}")
+                continue
+            snap = child.snapshot()
+            sep = "," if labels else ""
+            for le, n in snap["buckets"].items():
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{le}"}} {n}')
+            lines.append(f"{self.name}_sum{{{labels}}} {snap['sum']}")
+            lines.append(f"{self.name}_count{{{labels}}} {snap['count']}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY: List[Family] = []
+# Functii care produc linii suplimentare la randare (ex. gauge-uri pentru pool-ul DB)
+COLLECTORS: List[Callable[[], List[str]]] = []
+
+
+def render_prometheus() -> str:
+    """Toate metricile inregistrate, in formatul text Prometheus (0.0.4)"""
+    lines: List[str] = []
+    for family in REGISTRY:
+        lines.extend(family.render())
+    for collect in COLLECTORS:
+        lines.extend(collect())
+    return "\n".join(lines) + "\n"
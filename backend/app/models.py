@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, String, ForeignKey, Text, DateTime, Boolean, Table
+    BigInteger, Column, Integer, String, ForeignKey, Text, DateTime, Boolean, Table, Index, DDL, event, func
 )
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
@@ -22,6 +22,14 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Cautare substring (ILIKE '%q%') in admin: indexuri trigram (pg_trgm)
+    __table_args__ = (
+        Index("ix_users_email_trgm", email, postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+        Index("ix_users_username_trgm", username, postgresql_using="gin", postgresql_ops={"username": "gin_trgm_ops"}),
+        # Unicitatea emailului la import e verificata fara diferente de majuscule (lower(email) IN ...)
+        Index("ix_users_email_lower", func.lower(email)),
+    )
+
     roles = relationship("Role", secondary=user_roles, back_populates="users")
 
 class Role(Base):
@@ -40,13 +48,80 @@ class Post(Base):
     is_public = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Index pentru feed-ul public paginat cu cursor (created_at, id)
+    __table_args__ = (
+        Index("ix_posts_public_feed", is_public, created_at.desc(), id.desc()),
+    )
+
 class File(Base):
     __tablename__ = "files"
     id = Column(Integer, primary_key=True)
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    object_name = Column(String(512), nullable=False)
+    filename = Column(String(255), nullable=False)
+    size = Column(BigInteger, default=0)  # multipart: pana la UPLOAD_PART_SIZE * 10000
+    # Continut deduplicat: object_name = blob.object_name; NULL pentru obiectele per-user (vechi, multipart)
+    sha256 = Column(String(64), ForeignKey("blobs.sha256"), index=True)
+    # Artefacte derivate, produse asincron de worker (app.worker); NULL pana sunt gata
+    thumbnail_object = Column(String(512))
+    text_object = Column(String(512))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_files_filename_trgm", filename, postgresql_using="gin", postgresql_ops={"filename": "gin_trgm_ops"}),
+    )
+
+class Blob(Base):
+    # Obiect MinIO adresat prin continut, partajat de toate fisierele cu acelasi sha256
+    __tablename__ = "blobs"
+    sha256 = Column(String(64), primary_key=True)
+    object_name = Column(String(512), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(255))
+    refcount = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class StorageUsage(Base):
+    # Contor per utilizator, actualizat in aceeasi tranzactie cu randurile din files
+    __tablename__ = "storage_usage"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    bytes = Column(BigInteger, nullable=False, default=0)
+    files = Column(Integer, nullable=False, default=0)
+    quota_bytes = Column(BigInteger)  # NULL = STORAGE_QUOTA_BYTES
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (Index("ix_storage_usage_bytes", bytes.desc()),)
+
+class Job(Base):
+    # Coada durabila de joburi de fundal; preluare cu SELECT ... FOR UPDATE SKIP LOCKED
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), index=True)
+    status = Column(String(20), nullable=False, default="queued")  # queued | running | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime)
+    locked_by = Column(String(100))
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (Index("ix_jobs_claim", status, run_after),)
+
+class Upload(Base):
+    # Upload in curs: multipart (mapat pe un S3 multipart upload) sau POST presemnat direct in MinIO
+    __tablename__ = "uploads"
+    id = Column(String(32), primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    s3_upload_id = Column(String(255))  # NULL = POST presemnat
     object_name = Column(String(512), nullable=False)
     filename = Column(String(255), nullable=False)
-    size = Column(Integer, default=0)
+    content_type = Column(String(255))
+    part_size = Column(Integer)  # NULL = POST presemnat (o singura cerere)
+    # Dimensiunea declarata la init: rezervata din cota, partile nu o pot depasi
+    size = Column(BigInteger, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class Discussion(Base):
@@ -64,9 +139,39 @@ class Message(Base):
     body = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Index pentru istoricul unei discutii paginat cu cursor (in ambele directii)
+    __table_args__ = (
+        Index("ix_messages_discussion_created", discussion_id, created_at, id),
+    )
+
 class Status(Base):
     __tablename__ = "statuses"
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     text = Column(String(280), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# === Cautare full-text (doar Postgres) ===
+# Coloane tsvector generate + indexuri GIN, adaugate prin DDL ca modelele sa ramana
+# portabile (SQLite pentru rulari locale/benchmark). Folosite de routers/search.py.
+SEARCH_CONFIG = "simple"
+
+event.listen(
+    Base.metadata, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+def _search_vector_ddl(table: Table, expression: str):
+    for stmt in (
+        f"ALTER TABLE {table.name} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({expression}) STORED",
+        f"CREATE INDEX ix_{table.name}_search_vector ON {table.name} USING gin (search_vector)",
+    ):
+        event.listen(table, "after_create", DDL(stmt).execute_if(dialect="postgresql"))
+
+_search_vector_ddl(
+    Post.__table__,
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')",
+)
+_search_vector_ddl(Message.__table__, f"to_tsvector('{SEARCH_CONFIG}', coalesce(body, ''))")
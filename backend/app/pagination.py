@@ -0,0 +1,44 @@
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+
+# Cursor opac pentru paginare keyset: (created_at, id) codificat base64url
+def encode_cursor(created_at: datetime, id: int) -> str:
+    raw = f"{created_at.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_cursor(stmt, created_at_col, id_col, cursor: Optional[str], limit: int, after: bool = False):
+    """
+    Filtru + ordonare keyset; aduce limit + 1 randuri pentru a sti daca mai exista pagini.
+    Implicit descrescator (randuri mai vechi decat cursorul); after=True => crescator, mai noi.
+    """
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        key, bound = tuple_(created_at_col, id_col), tuple_(created_at, last_id)
+        stmt = stmt.where(key > bound if after else key < bound)
+    if after:
+        return stmt.order_by(created_at_col.asc(), id_col.asc()).limit(limit + 1)
+    return stmt.order_by(created_at_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def page_from_rows(rows: List[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return items, next_cursor
@@ -0,0 +1,179 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+# Modul fara importuri din aplicatie: este incarcat si in procesele din pool
+
+# === Config bcrypt / pool ===
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Implicit cate un proces per CPU: bcrypt e legat de CPU, mai multe procese doar se concureaza
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS") or os.cpu_count() or 2)
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", "32"))
+
+# Hash-urile cu alt cost decat BCRYPT_ROUNDS sunt raportate ca "deprecated" si refacute la login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_pending = 0
+
+
+# === Functii rulate in procesele din pool ===
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed)
+
+
+# === Pool ===
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _pool
+
+def _discard_pool(broken: ProcessPoolExecutor):
+    """Un proces din pool a murit (OOM, kill): pool-ul e inutilizabil, urmatorul apel creeaza altul"""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def _try_admit() -> bool:
+    global _pending
+    with _pool_lock:
+        if _pending >= PASSWORD_POOL_MAX_PENDING:
+            return False
+        _pending += 1
+        return True
+
+def _admit():
+    """Rezerva un loc in coada; respinge imediat cu 503 daca e plina"""
+    if not _try_admit():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Password hashing is saturated, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+def _release():
+    global _pending
+    with _pool_lock:
+        _pending -= 1
+
+def _run(fn, *args):
+    _admit()
+    try:
+        for retry in (False, True):
+            pool = _get_pool()
+            try:
+                return pool.submit(fn, *args).result()
+            except BrokenProcessPool:
+                _discard_pool(pool)
+                if retry:
+                    raise
+    finally:
+        _release()
+
+async def _run_async(fn, *args):
+    _admit()
+    try:
+        for retry in (False, True):
+            pool = _get_pool()
+            try:
+                return await asyncio.wrap_future(pool.submit(fn, *args))
+            except BrokenProcessPool:
+                _discard_pool(pool)
+                if retry:
+                    raise
+    finally:
+        _release()
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def pool_stats() -> dict:
+    return {
+        "workers": PASSWORD_POOL_WORKERS,
+        "max_pending": PASSWORD_POOL_MAX_PENDING,
+        "pending": _pending,
+    }
+
+
+# === API public ===
+def hash_password(password: str) -> str:
+    return _run(_hash, password)
+
+def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """(parola corecta, hash nou daca cel vechi trebuie refacut altfel None)"""
+    return _run(_verify_and_update, password, hashed)
+
+async def hash_password_async(password: str) -> str:
+    return await _run_async(_hash, password)
+
+async def verify_and_update_async(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return await _run_async(_verify_and_update, password, hashed)
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Hash-uri pentru un lot (import). Cel mult PASSWORD_POOL_WORKERS in zbor, fiecare admis ca un login:
+    coada pool-ului ramane scurta, iar cand e plina importul asteapta (login-urile nu primesc 503 din cauza lui).
+    """
+    results: List[Optional[str]] = [None] * len(passwords)
+    todo = list(reversed(range(len(passwords))))
+    inflight = {}  # future -> (pool, index)
+    broken = set()
+
+    def requeue(pool, i):
+        # Toate futures din pool-ul cazut ajung aici; un al doilea pool cazut => eroare, ca la _run
+        if pool not in broken:
+            if broken:
+                raise BrokenProcessPool("password pool broke twice")
+            broken.add(pool)
+            _discard_pool(pool)
+        todo.append(i)
+
+    try:
+        while todo or inflight:
+            while todo and len(inflight) < PASSWORD_POOL_WORKERS and _try_admit():
+                i = todo.pop()
+                pool = _get_pool()
+                try:
+                    inflight[pool.submit(_hash, passwords[i])] = (pool, i)
+                except BrokenProcessPool:
+                    _release()
+                    requeue(pool, i)
+            if not inflight:
+                time.sleep(0.05)  # coada plina (login-uri): importul cedeaza
+                continue
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for future in done:
+                pool, i = inflight.pop(future)
+                _release()
+                try:
+                    results[i] = future.result()
+                except BrokenProcessPool:
+                    requeue(pool, i)
+    finally:
+        for future in inflight:
+            future.cancel()
+            _release()
+    return results
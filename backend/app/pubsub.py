@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+from sqlalchemy import text
+
+from .db import engine
+
+logger = logging.getLogger(__name__)
+
+# Mesaje in asteptare per abonat; un client care ramane in urma e deconectat (nu creste memoria)
+REALTIME_QUEUE_SIZE = int(os.getenv("REALTIME_QUEUE_SIZE", "100"))
+# true = fan-out intre workeri prin Postgres LISTEN/NOTIFY
+REALTIME_PG_NOTIFY = os.getenv("REALTIME_PG_NOTIFY", "false").lower() == "true"
+NOTIFY_CHANNEL = "discussion_messages"
+NOTIFY_MAX_PAYLOAD = 7900  # limita Postgres e 8000 bytes
+
+
+class Subscription:
+    def __init__(self, discussion_id: int):
+        self.discussion_id = discussion_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=REALTIME_QUEUE_SIZE)
+        self.dropped = False
+
+    async def get(self) -> Optional[str]:
+        """Urmatorul mesaj; None daca abonatul a fost deconectat pentru ca a ramas in urma"""
+        return await self.queue.get()
+
+
+class Hub:
+    """Pub/sub in proces: discussion_id -> abonati (WebSocket/SSE)"""
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subs: Dict[int, Set[Subscription]] = defaultdict(set)
+        self.dropped = 0
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+    def subscribe(self, discussion_id: int) -> Subscription:
+        sub = Subscription(discussion_id)
+        self._subs[discussion_id].add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        subs = self._subs.get(sub.discussion_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subs[sub.discussion_id]
+
+    def dispatch(self, discussion_id: int, payload: str):
+        """Livreaza local; poate fi apelat din orice thread"""
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self._deliver, discussion_id, payload)
+
+    def _deliver(self, discussion_id: int, payload: str):
+        for sub in list(self._subs.get(discussion_id, ())):
+            if sub.dropped:
+                continue
+            try:
+                sub.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # Backpressure: abonatul lent e scos; se reconecteaza si recupereaza din istoric
+                sub.dropped = True
+                self.dropped += 1
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.queue.put_nowait(None)
+                self.unsubscribe(sub)
+
+    def stats(self) -> dict:
+        return {
+            "discussions": len(self._subs),
+            "subscribers": sum(len(s) for s in self._subs.values()),
+            "dropped_slow_consumers": self.dropped,
+            "pg_notify": REALTIME_PG_NOTIFY,
+        }
+
+hub = Hub()
+
+
+def message_payload(m, username: str) -> str:
+    return json.dumps({
+        "id": m.id,
+        "discussion_id": m.discussion_id,
+        "author_id": m.author_id,
+        "author": {"id": m.author_id, "username": username},
+        "body": m.body,
+        "created_at": m.created_at.isoformat() if m.created_at else None,
+    })
+
+
+def notify_sql(discussion_id: int, payload: str):
+    """
+    pg_notify in aceeasi tranzactie cu INSERT-ul: Postgres il livreaza doar la commit.
+    Mesajele prea mari pentru NOTIFY pleaca fara continut; clientul le ia din istoric.
+    """
+    if len(payload.encode()) > NOTIFY_MAX_PAYLOAD:
+        data = json.loads(payload)
+        payload = json.dumps({"id": data["id"], "discussion_id": discussion_id, "truncated": True})
+    return text("SELECT pg_notify(:channel, :payload)").bindparams(
+        channel=NOTIFY_CHANNEL, payload=f"{discussion_id}:{payload}"
+    )
+
+
+def publish(discussion_id: int, payload: str):
+    """Dupa commit: fara bridge, livrare locala directa (cu bridge, livreaza listener-ul)"""
+    if not REALTIME_PG_NOTIFY:
+        hub.dispatch(discussion_id, payload)
+
+
+# === Bridge LISTEN/NOTIFY (un thread per worker) ===
+_listener_stop = threading.Event()
+
+def _listen_loop():
+    import psycopg2
+    from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+    dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    while not _listener_stop.is_set():
+        conn = None
+        try:
+            conn = psycopg2.connect(dsn)
+            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+            while not _listener_stop.is_set():
+                if select.select([conn], [], [], 5) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    n = conn.notifies.pop(0)
+                    discussion_id, payload = n.payload.split(":", 1)
+                    hub.dispatch(int(discussion_id), payload)
+        except Exception:
+            logger.warning("LISTEN/NOTIFY bridge failed, reconnecting", exc_info=True)
+            _listener_stop.wait(2)
+        finally:
+            if conn is not None:
+                conn.close()
+
+def start_listener():
+    if REALTIME_PG_NOTIFY:
+        _listener_stop.clear()
+        threading.Thread(target=_listen_loop, name="pg-notify-listener", daemon=True).start()
+
+def stop_listener():
+    _listener_stop.set()
@@ -0,0 +1,277 @@
+import ipaddress
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from starlette.responses import JSONResponse
+
+from .auth import _token_subject
+from .metrics import Family
+
+logger = logging.getLogger(__name__)
+
+# === Config ===
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Optional: bucket-uri partajate intre workeri (necesita pachetul redis)
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# true doar in spatele nginx (care suprascrie X-Real-IP); altfel headerul poate fi falsificat
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+# Adresele de la care X-Real-IP e crezut: IP-uri, retele CIDR sau nume (serviciul nginx din compose)
+TRUSTED_PROXIES = [p.strip() for p in os.getenv("TRUSTED_PROXIES", "nginx").split(",") if p.strip()]
+TRUSTED_PROXIES_REFRESH = 60.0
+
+# Admission control: cereri in executie per worker; 0 = fara limita
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "0"))
+ADMISSION_MAX_WRITES = int(os.getenv("ADMISSION_MAX_WRITES", "0"))
+
+rate_limited = Family("rate_limited_total", "Cereri respinse de token bucket", "counter", ("policy",))
+requests_shed = Family("requests_shed_total", "Cereri respinse de admission control", "counter", ("priority",))
+
+
+# === Politici: "N/S" = N cereri la S secunde (si burst N) ===
+@dataclass(frozen=True)
+class Policy:
+    name: str
+    rate: float   # tokeni pe secunda
+    burst: float  # capacitatea bucket-ului
+
+def _policy(name: str, default: str) -> Policy:
+    spec = os.getenv(f"RATE_LIMIT_{name.upper()}", default)
+    count, seconds = spec.split("/")
+    return Policy(name, float(count) / float(seconds), float(count))
+
+POLICIES: Dict[str, Policy] = {
+    p.name: p for p in (
+        _policy("login", "10/60"),       # per IP si per username: bcrypt + brute force
+        _policy("register", "5/60"),     # per IP
+        _policy("upload", "30/60"),      # per user: transfer complet de obiect
+        _policy("write", "120/60"),      # per user: posts, mesaje, discutii, status
+    )
+}
+
+
+# === Backend in memorie: (tokeni, ultima actualizare) per cheie, LRU marginit ===
+class LocalBuckets:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._data: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, policy: Policy, cost: float = 1.0) -> float:
+        """0 daca cererea trece, altfel secundele de asteptat pana la urmatorul token"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._data.get(key, (policy.burst, now))
+            tokens = min(policy.burst, tokens + (now - last) * policy.rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / policy.rate
+            self._data[key] = (tokens, now)
+            self._data.move_to_end(key)
+            # Peste limita pleaca cheile nevazute de cel mai mult timp (de regula bucket-uri deja pline)
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+            return wait
+
+    def stats(self) -> dict:
+        return {"backend": "local", "keys": len(self._data), "max_keys": self.max_keys}
+
+
+class RedisBuckets:
+    """Acelasi algoritm, atomic intr-un script Lua; ceasul e cel al Redis (comun tuturor workerilor)"""
+
+    SCRIPT = """
+    local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1e6
+    local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(b[1]) or burst
+    local ts = tonumber(b[2]) or now
+    tokens = math.min(burst, tokens + (now - ts) * rate)
+    local wait = 0
+    if tokens >= cost then tokens = tokens - cost else wait = (cost - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def take(self, key: str, policy: Policy, cost: float = 1.0) -> float:
+        try:
+            return float(self.script(keys=[f"rl:{key}"], args=[policy.rate, policy.burst, cost]))
+        except Exception:
+            # Redis indisponibil: nu blocam tot traficul din cauza limitatorului
+            logger.warning("rate limit backend unavailable, allowing request", exc_info=True)
+            return 0.0
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
+
+
+buckets = RedisBuckets(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_REDIS_URL else LocalBuckets(RATE_LIMIT_MAX_KEYS)
+
+
+_proxies = {"at": float("-inf"), "networks": []}
+
+
+def _trusted_networks() -> List:
+    """TRUSTED_PROXIES rezolvate; numele sunt re-rezolvate periodic (IP-ul containerului se poate schimba)"""
+    now = time.monotonic()
+    if now - _proxies["at"] > TRUSTED_PROXIES_REFRESH:
+        networks = []
+        for entry in TRUSTED_PROXIES:
+            try:
+                networks.append(ipaddress.ip_network(entry, strict=False))
+                continue
+            except ValueError:
+                pass
+            try:
+                networks += [ipaddress.ip_network(info[4][0]) for info in socket.getaddrinfo(entry, None)]
+            except socket.gaierror:
+                logger.warning("trusted proxy %s does not resolve", entry)
+        _proxies.update(at=now, networks=networks)
+    return _proxies["networks"]
+
+
+def _from_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_networks())
+
+
+def client_ip(request: Request) -> str:
+    host = request.client.host if request.client else "unknown"
+    # Headerul conteaza doar cand cererea vine chiar de la proxy; direct pe :8000 poate fi falsificat
+    if TRUST_PROXY_HEADERS and _from_trusted_proxy(host):
+        real_ip = request.headers.get("x-real-ip")
+        if real_ip:
+            return real_ip
+    return host
+
+
+def _subject(request: Request) -> Optional[str]:
+    """Username-ul din token, fara DB: limitarea ruleaza inaintea autentificarii complete"""
+    header = request.headers.get("authorization", "")
+    if not header.lower().startswith("bearer "):
+        return None
+    try:
+        return _token_subject(header[7:])
+    except HTTPException:
+        return None
+
+
+def check(policy_name: str, key: str):
+    if not RATE_LIMIT_ENABLED:
+        return
+    policy = POLICIES[policy_name]
+    wait = buckets.take(f"{policy_name}:{key}", policy)
+    if wait > 0:
+        rate_limited.labels(policy_name).inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, retry later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+
+def rate_limit(policy_name: str):
+    """Dependinta: bucket per user autentificat, altfel per IP"""
+    POLICIES[policy_name]  # nume gresit => eroare la import, nu la prima cerere
+
+    def dependency(request: Request):
+        subject = _subject(request)
+        check(policy_name, f"user:{subject}" if subject else f"ip:{client_ip(request)}")
+
+    return dependency
+
+
+def login_limit(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    """Login: bucket per IP (un script) si per username (ghicire distribuita a parolei)"""
+    check("login", f"ip:{client_ip(request)}")
+    check("login", f"username:{form_data.username}")
+
+
+def stats() -> dict:
+    return {
+        "enabled": RATE_LIMIT_ENABLED,
+        "policies": {p.name: {"per_second": p.rate, "burst": p.burst} for p in POLICIES.values()},
+        "buckets": buckets.stats(),
+        "admission": {
+            "max_inflight": ADMISSION_MAX_INFLIGHT,
+            "max_writes": ADMISSION_MAX_WRITES,
+            "inflight": _inflight["all"],
+            "inflight_writes": _inflight["write"],
+        },
+    }
+
+
+# === Admission control pe prioritati ===
+# Scrierile au propria limita, mai mica: o furtuna de upload-uri nu ocupa locurile citirilor.
+# Probele (health/ready/metrics) nu sunt niciodata respinse. Se limiteaza munca pana la primul
+# octet al raspunsului, nu durata conexiunii.
+EXEMPT_PATHS = {"/health", "/ready", "/metrics"}
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+_inflight = {"all": 0, "write": 0}
+
+
+class AdmissionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            return await self.app(scope, receive, send)
+
+        priority = "read" if scope["method"] in READ_METHODS else "write"
+        # Middleware ASGI: toate cererile trec prin acelasi event loop, contoarele nu au nevoie de lock
+        if (ADMISSION_MAX_INFLIGHT and _inflight["all"] >= ADMISSION_MAX_INFLIGHT) or (
+            priority == "write" and ADMISSION_MAX_WRITES and _inflight["write"] >= ADMISSION_MAX_WRITES
+        ):
+            requests_shed.labels(priority).inc()
+            response = JSONResponse(
+                {"detail": "Server busy, retry shortly"}, status_code=503, headers={"Retry-After": "1"}
+            )
+            return await response(scope, receive, send)
+
+        _inflight["all"] += 1
+        if priority == "write":
+            _inflight["write"] += 1
+        held = True
+
+        def release():
+            nonlocal held
+            if held:
+                held = False
+                _inflight["all"] -= 1
+                if priority == "write":
+                    _inflight["write"] -= 1
+
+        async def send_wrapper(message):
+            # Locul se elibereaza cand incepe raspunsul: SSE (/discussions/{id}/events) si exporturile
+            # in streaming nu tin sloturi cat timp conexiunea ramane deschisa
+            if message["type"] == "http.response.start":
+                release()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            release()
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import threading
+from typing import Optional, Tuple
+
+from fastapi import Request, Response
+
+from .cache import TTLCache
+
+# Cache de raspunsuri pentru rutele publice: corpul JSON gata serializat + ETag puternic.
+# Implicit in proces; cu RESPONSE_CACHE_REDIS_URL intrarile sunt partajate intre workeri.
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_MAXSIZE = int(os.getenv("RESPONSE_CACHE_MAXSIZE", "512"))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")
+# max-age pentru browser/CDN; 0 = revalidare la fiecare cerere (If-None-Match -> 304)
+PUBLIC_CACHE_MAX_AGE = int(os.getenv("PUBLIC_CACHE_MAX_AGE", "0"))
+
+Entry = Tuple[str, bytes]  # (etag, body)
+
+
+class LocalBackend:
+    """In proces: TTLCache + generatie per namespace (ca in counting)"""
+
+    def __init__(self):
+        self.cache = TTLCache(maxsize=RESPONSE_CACHE_MAXSIZE, ttl=RESPONSE_CACHE_TTL)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def get(self, key: str) -> Optional[Entry]:
+        return self.cache.get(key)
+
+    def set(self, key: str, entry: Entry):
+        self.cache.set(key, entry)
+
+    def stats(self) -> dict:
+        return {"backend": "local", **self.cache.stats()}
+
+
+class RedisBackend:
+    """Partajat intre workeri; generatia e tot in Redis ca invalidarea sa fie vazuta de toti"""
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def generation(self, namespace: str) -> int:
+        return int(self.client.get(f"rc:gen:{namespace}") or 0)
+
+    def bump(self, namespace: str):
+        self.client.incr(f"rc:gen:{namespace}")
+
+    def get(self, key: str) -> Optional[Entry]:
+        raw = self.client.get(f"rc:{key}")
+        if raw is None:
+            return None
+        etag, body = raw.split(b"\n", 1)
+        return etag.decode(), body
+
+    def set(self, key: str, entry: Entry):
+        etag, body = entry
+        self.client.set(f"rc:{key}", etag.encode() + b"\n" + body, ex=int(RESPONSE_CACHE_TTL))
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "ttl": RESPONSE_CACHE_TTL}
+
+
+backend = RedisBackend(RESPONSE_CACHE_REDIS_URL) if RESPONSE_CACHE_REDIS_URL else LocalBackend()
+
+
+def cache_key(request: Request, namespace: str) -> str:
+    """Calculata inainte de query: un create_post concurent muta generatia, iar raspunsul
+    construit din date vechi ajunge sub o cheie pe care nu o mai citeste nimeni"""
+    # Parametrii sortati: ?limit=5&cursor=x si ?cursor=x&limit=5 au aceeasi intrare
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{namespace}:{backend.generation(namespace)}:{request.url.path}?{params}"
+
+
+def lookup(key: str) -> Optional[Entry]:
+    return backend.get(key)
+
+
+def store(key: str, body: bytes) -> Entry:
+    entry = ('"%s"' % hashlib.sha256(body).hexdigest()[:32], body)
+    backend.set(key, entry)
+    return entry
+
+
+def respond(request: Request, entry: Entry) -> Response:
+    etag, body = entry
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={PUBLIC_CACHE_MAX_AGE}" if PUBLIC_CACHE_MAX_AGE else "public, no-cache",
+    }
+    inm = request.headers.get("if-none-match")
+    # Comparatie slaba: varianta comprimata/MessagePack circula cu W/ in fata aceluiasi tag
+    if inm and (inm.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in inm.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def invalidate(namespace: str):
+    backend.bump(namespace)
+
+
+def stats() -> dict:
+    return backend.stats()
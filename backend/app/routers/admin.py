@@ -1,15 +1,27 @@
 # backend/app/routers/admin.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import csv
+import io
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select, or_
 from sqlalchemy.orm import Session
-from ..database import get_db
-from ..models import User, Role, user_roles
-from ..auth import get_current_user
-from typing import List
-from pydantic import BaseModel
+from ..db import get_db, get_read_db, read_session, dialect_insert
+from ..models import User, Role, File as FileModel, StorageUsage, Upload, user_roles
+from .. import blobs, usage
+from ..passwords import hash_passwords
+from ..serialization import FastJSONResponse
+from ..auth import Principal, get_current_user, invalidate_principal
+from ..counting import CountStrategy, DEFAULT_COUNT_STRATEGY, count_rows, invalidate_counts
+from typing import Dict, Iterator, List, Literal, Optional
+from pydantic import BaseModel, EmailStr, Field, ValidationError
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 500
+
 class UserResponse(BaseModel):
     id: int
     username: str
@@ -21,78 +33,282 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
-@router.get("/users", response_model=List[UserResponse])
-async def list_users(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+class UsersPage(BaseModel):
+    items: List[UserResponse]
+    total: int
+    total_strategy: str  # exact | cached | estimated
+    page: int
+    page_size: int
+
+class AdminFile(BaseModel):
+    id: int
+    owner_id: Optional[int] = None
+    owner_username: Optional[str] = None
+    filename: str
+    size: Optional[int] = None
+    created_at: Optional[str] = None
+
+class FilesPage(BaseModel):
+    items: List[AdminFile]
+    total: int
+    total_strategy: str  # exact | cached | estimated
+    page: int
+    page_size: int
+
+class StorageConsumer(BaseModel):
+    user_id: int
+    username: str
+    bytes: int
+    files: int
+    quota_bytes: Optional[int] = None
+
+class QuotaUpdate(BaseModel):
+    quota_bytes: Optional[int] = Field(None, ge=0)  # None = cota implicita
+
+class UserImportRow(BaseModel):
+    username: str = Field(min_length=1, max_length=50)
+    email: EmailStr
+    password: str = Field(min_length=6, max_length=128)
+    roles: List[str] = ["user"]
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportReport(BaseModel):
+    created: int
+    failed: int
+    errors: List[ImportRowError]
+
+def ensure_administrator(current_user: Principal, detail: str = "Acces interzis"):
+    """Verificare rol pe principalul din cache - fara query-uri suplimentare"""
+    if 'administrator' not in current_user.roles:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+
+def _roles_by_user(db: Session, user_ids: List[int]) -> Dict[int, List[str]]:
+    roles: Dict[int, List[str]] = {}
+    if user_ids:
+        for user_id, name in db.execute(
+            select(user_roles.c.user_id, Role.name)
+            .join(Role, Role.id == user_roles.c.role_id)
+            .where(user_roles.c.user_id.in_(user_ids))
+        ):
+            roles.setdefault(user_id, []).append(name)
+    return roles
+
+def _user_row(user, role_names: List[str]) -> dict:
+    return {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "is_active": user.is_active,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+        "roles": role_names or ['guest'],
+    }
+
+@router.get("/users", response_model=UsersPage, response_class=FastJSONResponse)
+def list_users(
+    q: Optional[str] = Query(None, description="Cautare in username/email"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200),
+    count_strategy: CountStrategy = Query(DEFAULT_COUNT_STRATEGY),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
-    """Lista tuturor utilizatorilor - doar pentru admin"""
-    
-    # Verifică dacă utilizatorul curent este admin
-    user_roles_query = db.query(user_roles).filter(user_roles.c.user_id == current_user.id)
-    role_ids = [row.role_id for row in user_roles_query.all()]
-    
-    if role_ids:
-        roles = db.query(Role).filter(Role.id.in_(role_ids)).all()
-        user_role_names = [role.name for role in roles]
-        
-        if 'administrator' not in user_role_names:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Doar administratorii pot accesa această resursă"
-            )
-    else:
+    """Lista utilizatorilor (paginata) - doar pentru admin"""
+    if not current_user.roles:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Utilizatorul nu are roluri atribuite"
         )
-    
-    # Obține toți utilizatorii cu rolurile lor
-    users = db.query(User).all()
-    users_with_roles = []
-    
-    for user in users:
-        # Obține rolurile utilizatorului
-        user_roles_query = db.query(user_roles).filter(user_roles.c.user_id == user.id)
-        role_ids = [row.role_id for row in user_roles_query.all()]
-        
-        if role_ids:
-            roles = db.query(Role).filter(Role.id.in_(role_ids)).all()
-            role_names = [role.name for role in roles]
+    ensure_administrator(current_user, "Doar administratorii pot accesa această resursă")
+
+    # Numar constant de query-uri: count + pagina + roluri (selectin, un singur IN)
+    # ILIKE '%q%' poate folosi indexurile trigram (pg_trgm) pe username/email
+    where = []
+    if q:
+        like = f"%{q}%"
+        where.append(User.username.ilike(like) | User.email.ilike(like))
+
+    total, total_strategy = count_rows(
+        db, select(User.id).where(*where), "users", ("q", q), bool(where), count_strategy
+    )
+    # Doar coloanele afisate, ca randuri; rolurile paginii intr-un singur query
+    users = db.execute(
+        select(User.id, User.username, User.email, User.is_active, User.created_at)
+        .where(*where)
+        .order_by(User.id)
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+    ).all()
+    roles = _roles_by_user(db, [u.id for u in users])
+
+    # Datele vin direct din DB: serializare fara re-validare prin UsersPage
+    return FastJSONResponse({
+        "items": [_user_row(u, roles.get(u.id, [])) for u in users],
+        "total": total,
+        "total_strategy": total_strategy,
+        "page": page,
+        "page_size": page_size,
+    })
+
+@router.get("/users/export")
+async def export_users(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: Principal = Depends(get_current_user),
+):
+    """Export complet al utilizatorilor, in streaming (NDJSON sau CSV)"""
+    ensure_administrator(current_user)
+
+    def rows():
+        # Sesiune proprie: generatorul ruleaza dupa ce dependintele s-au inchis
+        db = read_session()
+        try:
+            result = db.execute(
+                select(User).order_by(User.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+            ).scalars()
+            for batch in result.partitions():
+                # Rolurile pentru tot lotul, intr-un singur query
+                roles = _roles_by_user(db, [u.id for u in batch])
+                yield [_user_row(u, roles.get(u.id, [])) for u in batch]
+        finally:
+            db.close()
+
+    if format == "csv":
+        fields = ["id", "username", "email", "is_active", "created_at", "roles"]
+
+        def body():
+            buf = io.StringIO()
+            writer = csv.DictWriter(buf, fieldnames=fields)
+            writer.writeheader()
+            for batch in rows():
+                for row in batch:
+                    writer.writerow({**row, "roles": ";".join(row["roles"])})
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            yield buf.getvalue()
+
+        return StreamingResponse(
+            body(), media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="users.csv"'},
+        )
+
+    def body():
+        for batch in rows():
+            yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in batch)
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+def _import_records(f: UploadFile, format: str) -> Iterator[dict]:
+    """Citeste fisierul incarcat linie cu linie (fara a-l tine integral in memorie)"""
+    text = io.TextIOWrapper(f.file, encoding="utf-8-sig", newline="")
+    if format == "csv":
+        for rec in csv.DictReader(text):
+            roles = (rec.get("roles") or "").strip()
+            if roles:
+                rec["roles"] = [r.strip() for r in roles.split(";") if r.strip()]
+            else:
+                rec.pop("roles", None)
+            yield rec
+    else:
+        for line in text:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    yield None
+
+def _import_batch(
+    db: Session, batch: List[tuple], role_ids: Dict[str, int], seen: set, errors: List[ImportRowError]
+) -> int:
+    """Un lot: un query de unicitate, hash-uri in paralel (fara conexiune tinuta), INSERT ... ON CONFLICT, roluri in bloc"""
+    existing = db.execute(
+        select(User.username, User.email).where(or_(
+            User.username.in_([r.username for _, r in batch]),
+            func.lower(User.email).in_([r.email.lower() for _, r in batch]),
+        ))
+    ).all()
+    taken = {u for u, _ in existing} | {e.lower() for _, e in existing}
+
+    accepted = []
+    for n, r in batch:
+        unknown = [name for name in r.roles if name not in role_ids]
+        if r.username in taken or r.email.lower() in taken:
+            errors.append(ImportRowError(row=n, error="Username or email already exists"))
+        elif r.username in seen or r.email.lower() in seen:
+            errors.append(ImportRowError(row=n, error="Duplicate username or email in file"))
+        elif unknown:
+            errors.append(ImportRowError(row=n, error=f"Unknown role(s): {', '.join(unknown)}"))
         else:
-            role_names = ['guest']
-        
-        users_with_roles.append({
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "is_active": user.is_active,
-            "created_at": user.created_at.isoformat(),
-            "roles": role_names
-        })
-    
-    return users_with_roles
+            seen.update((r.username, r.email.lower()))
+            accepted.append((n, r))
+    # Conexiunea se elibereaza cat dureaza hash-urile (secunde pentru un lot); INSERT-ul deschide alta tranzactie
+    db.rollback()
+    if not accepted:
+        return 0
+
+    hashes = hash_passwords([r.password for _, r in accepted])
+    stmt = dialect_insert(User.__table__).on_conflict_do_nothing().returning(User.id, User.username)
+    inserted = db.execute(stmt, [
+        {"username": r.username, "email": r.email, "password_hash": h}
+        for (_, r), h in zip(accepted, hashes)
+    ]).all()
+    ids = {username: id for id, username in inserted}
+
+    links = []
+    for n, r in accepted:
+        if r.username not in ids:
+            # Inserat concurent intre verificare si INSERT
+            errors.append(ImportRowError(row=n, error="Username or email already exists"))
+            continue
+        links += [{"user_id": ids[r.username], "role_id": role_ids[name]} for name in set(r.roles)]
+    if links:
+        db.execute(user_roles.insert(), links)
+    db.commit()
+    return len(ids)
+
+@router.post("/users/import", response_model=ImportReport)
+def import_users(
+    f: UploadFile = File(..., description="CSV (username,email,password,roles) sau NDJSON"),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="implicit: dupa extensia fisierului"),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Import in masa de utilizatori; raport de erori per rand"""
+    ensure_administrator(current_user)
+    if format is None:
+        format = "ndjson" if (f.filename or "").endswith((".ndjson", ".jsonl")) else "csv"
+
+    role_ids = {name: id for id, name in db.execute(select(Role.id, Role.name))}
+    created, errors, seen, batch = 0, [], set(), []
+    for n, rec in enumerate(_import_records(f, format), start=1):
+        try:
+            batch.append((n, UserImportRow(**rec)))
+        except (ValidationError, TypeError) as e:
+            msg = e.errors()[0]["msg"] if isinstance(e, ValidationError) else "Invalid record"
+            errors.append(ImportRowError(row=n, error=msg))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            created += _import_batch(db, batch, role_ids, seen, errors)
+            batch = []
+    if batch:
+        created += _import_batch(db, batch, role_ids, seen, errors)
+
+    if created:
+        invalidate_counts("users")
+    errors.sort(key=lambda e: e.row)
+    return ImportReport(created=created, failed=len(errors), errors=errors)
 
 @router.delete("/users/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Șterge un utilizator - doar pentru admin"""
     
     # Verifică dacă utilizatorul curent este admin (same logic ca mai sus)
-    user_roles_query = db.query(user_roles).filter(user_roles.c.user_id == current_user.id)
-    role_ids = [row.role_id for row in user_roles_query.all()]
-    
-    if role_ids:
-        roles = db.query(Role).filter(Role.id.in_(role_ids)).all()
-        user_role_names = [role.name for role in roles]
-        
-        if 'administrator' not in user_role_names:
-            raise HTTPException(status_code=403, detail="Acces interzis")
-    else:
-        raise HTTPException(status_code=403, detail="Acces interzis")
+    ensure_administrator(current_user)
     
     # Nu permite ștergerea propriului cont
     if user_id == current_user.id:
@@ -107,31 +323,37 @@ async def delete_user(
     
     # Șterge rolurile utilizatorului mai întâi
     db.execute(user_roles.delete().where(user_roles.c.user_id == user_id))
-    
+
+    # Uploadurile în curs: multipart-ul / obiectul presemnat se anulează (best effort), rândul dispare
+    for up in db.query(Upload).filter(Upload.owner_id == user_id).all():
+        usage.discard_upload(db, up)
+
+    # Fișierele: blob-urile partajate rămân cât timp au alte referințe
+    files = db.query(FileModel).filter(FileModel.owner_id == user_id).all()
+    for rec in files:
+        blobs.release(db, rec)
+    db.query(StorageUsage).filter(StorageUsage.user_id == user_id).delete()
+
     # Șterge utilizatorul
     db.delete(user_to_delete)
     db.commit()
+    invalidate_counts("users")
+    if files:
+        invalidate_counts("files")
+    invalidate_principal(user_to_delete.username)
     
     return {"message": f"Utilizatorul {user_to_delete.username} a fost șters"}
 
 @router.post("/users/{user_id}/toggle-status")
 async def toggle_user_status(
     user_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Activează/dezactivează un utilizator"""
     
     # Verifică admin permissions (same logic)
-    user_roles_query = db.query(user_roles).filter(user_roles.c.user_id == current_user.id)
-    role_ids = [row.role_id for row in user_roles_query.all()]
-    
-    if role_ids:
-        roles = db.query(Role).filter(Role.id.in_(role_ids)).all()
-        user_role_names = [role.name for role in roles]
-        
-        if 'administrator' not in user_role_names:
-            raise HTTPException(status_code=403, detail="Acces interzis")
+    ensure_administrator(current_user)
     
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
@@ -139,5 +361,115 @@ async def toggle_user_status(
     
     user.is_active = not user.is_active
     db.commit()
+    invalidate_counts("users")
+    invalidate_principal(user.username)
     
-    return {"message": f"Utilizatorul {user.username} {'activat' if user.is_active else 'dezactivat'}"}
\ No newline at end of file
+    return {"message": f"Utilizatorul {user.username} {'activat' if user.is_active else 'dezactivat'}"}
+@router.get("/files", response_model=FilesPage, response_class=FastJSONResponse)
+def list_files(
+    q: Optional[str] = Query(None, description="Cautare in numele fisierului"),
+    user_id: Optional[int] = Query(None, description="Doar fisierele acestui utilizator"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200),
+    count_strategy: CountStrategy = Query(DEFAULT_COUNT_STRATEGY),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Lista fisierelor tuturor utilizatorilor (paginata) - doar pentru admin"""
+    ensure_administrator(current_user)
+
+    # ILIKE '%q%' poate folosi indexul trigram (pg_trgm) pe files.filename
+    where = []
+    if q:
+        where.append(FileModel.filename.ilike(f"%{q}%"))
+    if user_id is not None:
+        where.append(FileModel.owner_id == user_id)
+
+    total, total_strategy = count_rows(
+        db, select(FileModel.id).where(*where), "files", ("q", q, user_id), bool(where), count_strategy
+    )
+    rows = db.execute(
+        select(
+            FileModel.id, FileModel.owner_id, User.username, FileModel.filename, FileModel.size, FileModel.created_at
+        )
+        .outerjoin(User, User.id == FileModel.owner_id)
+        .where(*where)
+        .order_by(FileModel.id.desc())
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+    ).all()
+
+    return FastJSONResponse({
+        "items": [
+            {
+                "id": r.id,
+                "owner_id": r.owner_id,
+                "owner_username": r.username,
+                "filename": r.filename,
+                "size": r.size,
+                "created_at": r.created_at.isoformat() if r.created_at else None,
+            }
+            for r in rows
+        ],
+        "total": total,
+        "total_strategy": total_strategy,
+        "page": page,
+        "page_size": page_size,
+    })
+
+@router.delete("/files/{file_id}")
+def delete_file(
+    file_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Șterge un fișier; obiectul din MinIO rămâne cât timp alte fișiere au același conținut"""
+    ensure_administrator(current_user)
+
+    rec = db.get(FileModel, file_id)
+    if not rec:
+        raise HTTPException(status_code=404, detail="Fișierul nu există")
+    blobs.release(db, rec)
+    usage.add(db, rec.owner_id, -(rec.size or 0), -1)
+    db.commit()
+    invalidate_counts("files")
+
+    return {"message": f"Fișierul {rec.filename} a fost șters"}
+
+@router.get("/storage/top", response_model=List[StorageConsumer])
+def top_storage_consumers(
+    limit: int = Query(20, ge=1, le=200),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Cei mai mari consumatori de spațiu, din contoare (index pe bytes), fără agregare peste files"""
+    ensure_administrator(current_user)
+    rows = db.execute(
+        select(StorageUsage.user_id, User.username, StorageUsage.bytes, StorageUsage.files, StorageUsage.quota_bytes)
+        .join(User, User.id == StorageUsage.user_id)
+        .order_by(StorageUsage.bytes.desc())
+        .limit(limit)
+    ).all()
+    return [StorageConsumer(**row._mapping) for row in rows]
+
+@router.put("/users/{user_id}/quota")
+def set_user_quota(
+    user_id: int,
+    payload: QuotaUpdate,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Cotă individuală (bytes); null revine la cota implicită"""
+    ensure_administrator(current_user)
+    if not db.get(User, user_id):
+        raise HTTPException(status_code=404, detail="Utilizatorul nu există")
+    usage.add(db, user_id, 0, 0)
+    db.get(StorageUsage, user_id).quota_bytes = payload.quota_bytes
+    db.commit()
+    return usage.get(db, user_id)
+
+@router.post("/storage/reconcile")
+def reconcile_storage(current_user: Principal = Depends(get_current_user)):
+    """Reconciliere imediată a contoarelor cu files și cu obiectele din MinIO"""
+    ensure_administrator(current_user)
+    return usage.reconcile()
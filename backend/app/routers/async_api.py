@@ -0,0 +1,149 @@
+# backend/app/routers/async_api.py
+#
+# Variante async (AsyncSession + asyncpg) ale rutelor cu trafic mare.
+# Inregistrate in main doar cand DB_ASYNC=true; altfel raman rutele sync din main.
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import get_async_db, AsyncSessionLocal
+from ..models import User, Role, Post, File as FileModel, Discussion, Message, Status
+from ..schemas import (
+    UserCreate, UserOut, Token, PostCreate, PostOut, PostsPage,
+    DiscussionCreate, MessageCreate, MessagesPage, StatusCreate
+)
+from ..auth import Principal, create_access_token, get_current_user_async
+from ..discussions import messages_stmt, messages_page
+from ..listings import public_posts_stmt, posts_page_json, files_stmt, FILE_FIELDS
+from ..serialization import FastJSONResponse, rows_as_dicts
+from ..counting import invalidate_counts
+from .. import passwords, pubsub, ratelimit, response_cache
+
+router = APIRouter()
+
+
+# === Auth ===
+@router.post("/auth/register", response_model=UserOut, dependencies=[Depends(ratelimit.rate_limit("register"))])
+async def register(payload: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    exists = await db.execute(
+        select(User.id).where((User.username == payload.username) | (User.email == payload.email))
+    )
+    if exists.first():
+        raise HTTPException(status_code=400, detail="User already exists")
+    password_hash = await passwords.hash_password_async(payload.password)
+    role_user = (await db.execute(select(Role).where(Role.name == "user"))).scalar_one()
+    user = User(email=payload.email, username=payload.username, password_hash=password_hash, roles=[role_user])
+    db.add(user)
+    await db.commit()
+    invalidate_counts("users")
+    return UserOut(id=user.id, email=user.email, username=user.username, roles=[role_user.name])
+
+@router.post("/auth/login", response_model=Token, dependencies=[Depends(ratelimit.login_limit)])
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.username == form_data.username))).scalar_one_or_none()
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    ok, new_hash = await passwords.verify_and_update_async(form_data.password, user.password_hash)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
+    return Token(access_token=create_access_token({"sub": user.username}))
+
+@router.get("/users/me", response_model=UserOut)
+async def me(user: Principal = Depends(get_current_user_async)):
+    return UserOut(id=user.id, email=user.email, username=user.username, roles=list(user.roles))
+
+
+# === Blog posts ===
+@router.post("/posts", response_model=PostOut, dependencies=[Depends(ratelimit.rate_limit("write"))])
+async def create_post(
+    payload: PostCreate, db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user_async)
+):
+    p = Post(author_id=user.id, title=payload.title, content=payload.content, is_public=payload.is_public)
+    db.add(p)
+    await db.commit()
+    await db.refresh(p)
+    if p.is_public:
+        response_cache.invalidate("posts")
+    return p
+
+@router.get("/posts", response_model=PostsPage)
+async def list_posts(
+    request: Request,
+    cursor: Optional[str] = Query(None, description="next_cursor din pagina anterioara"),
+    limit: int = Query(20, ge=1, le=100),
+):
+    key = response_cache.cache_key(request, "posts")
+    entry = response_cache.lookup(key)
+    if entry is None:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(public_posts_stmt(cursor, limit))).all()
+        entry = response_cache.store(key, posts_page_json(rows, limit))
+    return response_cache.respond(request, entry)
+
+
+# === Files (Drive) ===
+@router.get("/files", response_class=FastJSONResponse)
+async def list_files(db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user_async)):
+    rows = (await db.execute(files_stmt(user.id))).all()
+    return FastJSONResponse(rows_as_dicts(rows, FILE_FIELDS))
+
+
+# === Discussions ===
+@router.post("/discussions", dependencies=[Depends(ratelimit.rate_limit("write"))])
+async def create_discussion(
+    payload: DiscussionCreate, db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user_async)
+):
+    d = Discussion(title=payload.title, created_by=user.id)
+    db.add(d)
+    await db.commit()
+    await db.refresh(d)
+    return d
+
+@router.post("/messages", dependencies=[Depends(ratelimit.rate_limit("write"))])
+async def post_message(
+    payload: MessageCreate, db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user_async)
+):
+    m = Message(discussion_id=payload.discussion_id, author_id=user.id, body=payload.body)
+    db.add(m)
+    await db.flush()
+    event = pubsub.message_payload(m, user.username)
+    if pubsub.REALTIME_PG_NOTIFY:
+        await db.execute(pubsub.notify_sql(m.discussion_id, event))
+    await db.commit()
+    pubsub.publish(m.discussion_id, event)
+    await db.refresh(m)
+    return m
+
+@router.get("/discussions/{discussion_id}/messages", response_model=MessagesPage, response_model_exclude_none=True)
+async def list_messages(
+    discussion_id: int,
+    before: Optional[str] = Query(None, description="before_cursor: mesaje mai vechi"),
+    after: Optional[str] = Query(None, description="after_cursor: mesaje mai noi"),
+    limit: int = Query(50, ge=1, le=200),
+    compact: bool = Query(False, description="autorii o singura data, in 'authors'"),
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_user_async),
+):
+    if not await db.get(Discussion, discussion_id):
+        raise HTTPException(status_code=404, detail="Discussion not found")
+    rows = (await db.execute(messages_stmt(discussion_id, before, after, limit))).all()
+    return messages_page(list(rows), limit, before, after, compact)
+
+
+# === Status ===
+@router.post("/status", dependencies=[Depends(ratelimit.rate_limit("write"))])
+async def set_status(
+    payload: StatusCreate, db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user_async)
+):
+    s = Status(user_id=user.id, text=payload.text)
+    db.add(s)
+    await db.commit()
+    await db.refresh(s)
+    return s
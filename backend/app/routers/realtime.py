@@ -0,0 +1,88 @@
+# backend/app/routers/realtime.py
+#
+# Mesaje noi in timp real, per discutie: WebSocket sau Server-Sent Events.
+# Browserele nu pot trimite header Authorization pe WebSocket/EventSource => token in query.
+
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from ..db import SessionLocal
+from ..models import Discussion
+from ..auth import Principal, principal_from_token
+from ..pubsub import hub
+
+router = APIRouter(prefix="/discussions", tags=["discussions"])
+
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def _authorize(discussion_id: int, token: str) -> Principal:
+    with SessionLocal() as db:
+        principal = principal_from_token(db, token)
+        if not db.get(Discussion, discussion_id):
+            raise HTTPException(status_code=404, detail="Discussion not found")
+    return principal
+
+
+@router.websocket("/{discussion_id}/ws")
+async def discussion_ws(websocket: WebSocket, discussion_id: int, token: str = Query(...)):
+    try:
+        await run_in_threadpool(_authorize, discussion_id, token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    sub = hub.subscribe(discussion_id)
+
+    async def send():
+        while True:
+            payload = await sub.get()
+            if payload is None:
+                # Client lent: inchidem, se reconecteaza si recupereaza cu after_cursor
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            await websocket.send_text(payload)
+
+    async def receive():
+        # Ignoram ce trimite clientul; doar detectam deconectarea
+        while True:
+            await websocket.receive_text()
+
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for t in tasks:
+            t.cancel()
+        hub.unsubscribe(sub)
+
+
+@router.get("/{discussion_id}/events")
+async def discussion_events(discussion_id: int, request: Request, token: str = Query(...)):
+    await run_in_threadpool(_authorize, discussion_id, token)
+    sub = hub.subscribe(discussion_id)
+
+    async def stream():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(sub.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if payload is None:
+                    yield "event: lagged\ndata: {}\n\n"
+                    return
+                yield f"event: message\ndata: {payload}\n\n"
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
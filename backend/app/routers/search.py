@@ -0,0 +1,136 @@
+# backend/app/routers/search.py
+#
+# Cautare full-text cu ranking si fragmente evidentiate (Postgres: tsvector + GIN).
+# Pe alte baze de date (SQLite local) cade pe ILIKE, fara ranking.
+
+import html
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select, func, literal_column, or_
+from sqlalchemy.orm import Session
+
+from ..db import get_read_db
+from ..models import Post, Message, SEARCH_CONFIG
+from ..auth import Principal, get_current_user
+from ..schemas import SearchHit, SearchResults
+
+router = APIRouter(tags=["search"])
+
+# ts_headline nu escapeaza textul: marcam cu caractere din zona privata Unicode, escapam HTML-ul
+# in Python si abia apoi punem <mark>. title/snippet sunt HTML sigur (doar <mark> nu e escapat).
+_START, _STOP = "\ue000", "\ue001"
+HEADLINE_OPTIONS = f"StartSel={_START}, StopSel={_STOP}, MaxFragments=2, MaxWords=30, MinWords=10"
+TITLE_HEADLINE_OPTIONS = f"HighlightAll=true, StartSel={_START}, StopSel={_STOP}"
+FALLBACK_SNIPPET_CHARS = 200
+
+
+def _safe_html(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    return html.escape(text).replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def _search_posts_pg(db: Session, q: str, limit: int):
+    tsq = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    vec = literal_column("posts.search_vector")
+    rank = func.ts_rank_cd(vec, tsq).label("rank")
+    # Intai top-N dupa rank (din index), apoi ts_headline doar pentru acestea
+    top = (
+        select(Post.id, rank)
+        .where(Post.is_public == True, vec.op("@@")(tsq))
+        .order_by(rank.desc())
+        .limit(limit)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            Post.id, Post.created_at, top.c.rank,
+            func.ts_headline(SEARCH_CONFIG, Post.title, tsq, TITLE_HEADLINE_OPTIONS),
+            func.ts_headline(SEARCH_CONFIG, Post.content, tsq, HEADLINE_OPTIONS),
+        )
+        .join(top, top.c.id == Post.id)
+        .order_by(top.c.rank.desc())
+    ).all()
+    return [
+        SearchHit(
+            type="post", id=id, title=_safe_html(title), snippet=_safe_html(snippet), rank=r, created_at=created_at
+        )
+        for id, created_at, r, title, snippet in rows
+    ]
+
+
+def _search_messages_pg(db: Session, q: str, limit: int):
+    tsq = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    vec = literal_column("messages.search_vector")
+    rank = func.ts_rank_cd(vec, tsq).label("rank")
+    top = (
+        select(Message.id, rank)
+        .where(vec.op("@@")(tsq))
+        .order_by(rank.desc())
+        .limit(limit)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            Message.id, Message.discussion_id, Message.created_at, top.c.rank,
+            func.ts_headline(SEARCH_CONFIG, Message.body, tsq, HEADLINE_OPTIONS),
+        )
+        .join(top, top.c.id == Message.id)
+        .order_by(top.c.rank.desc())
+    ).all()
+    return [
+        SearchHit(
+            type="message", id=id, discussion_id=discussion_id, snippet=_safe_html(snippet), rank=r,
+            created_at=created_at,
+        )
+        for id, discussion_id, created_at, r, snippet in rows
+    ]
+
+
+def _search_posts_fallback(db: Session, q: str, limit: int):
+    like = f"%{q}%"
+    rows = db.execute(
+        select(Post)
+        .where(Post.is_public == True, or_(Post.title.ilike(like), Post.content.ilike(like)))
+        .order_by(Post.created_at.desc())
+        .limit(limit)
+    ).scalars()
+    return [
+        SearchHit(
+            type="post", id=p.id, title=_safe_html(p.title), snippet=_safe_html(p.content[:FALLBACK_SNIPPET_CHARS]),
+            rank=0, created_at=p.created_at,
+        )
+        for p in rows
+    ]
+
+
+def _search_messages_fallback(db: Session, q: str, limit: int):
+    rows = db.execute(
+        select(Message).where(Message.body.ilike(f"%{q}%")).order_by(Message.created_at.desc()).limit(limit)
+    ).scalars()
+    return [
+        SearchHit(
+            type="message", id=m.id, discussion_id=m.discussion_id,
+            snippet=_safe_html(m.body[:FALLBACK_SNIPPET_CHARS]), rank=0, created_at=m.created_at,
+        )
+        for m in rows
+    ]
+
+
+@router.get("/search", response_model=SearchResults)
+def search(
+    q: str = Query(..., min_length=2, max_length=200),
+    type: Literal["all", "posts", "messages"] = "all",
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_read_db),
+    user: Principal = Depends(get_current_user),
+):
+    pg = db.get_bind().dialect.name == "postgresql"
+    items = []
+    if type in ("all", "posts"):
+        items += (_search_posts_pg if pg else _search_posts_fallback)(db, q, limit)
+    if type in ("all", "messages"):
+        items += (_search_messages_pg if pg else _search_messages_fallback)(db, q, limit)
+    items.sort(key=lambda h: h.rank, reverse=True)
+    return SearchResults(q=q, items=items[:limit])
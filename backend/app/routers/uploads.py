@@ -0,0 +1,267 @@
+# backend/app/routers/uploads.py
+
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Request
+from fastapi.concurrency import run_in_threadpool
+from minio.datatypes import Part, PostPolicy
+from minio.error import S3Error
+from sqlalchemy.orm import Session
+
+from ..db import get_db, SessionLocal
+from ..models import Upload, File as FileModel
+from ..auth import Principal, get_current_user
+from ..schemas import (
+    UploadInit, UploadOut, UploadPartOut,
+    PresignUploadIn, PresignCompleteIn, PresignedPostOut
+)
+from ..counting import invalidate_counts
+from .. import jobs, ratelimit, usage
+from ..storage import (
+    minio_client, presign_client, MINIO_BUCKET,
+    MINIO_PUBLIC_ENDPOINT, MINIO_PUBLIC_SECURE, UPLOAD_PART_SIZE, UPLOAD_MAX_PARTS, PRESIGN_EXPIRE_SECONDS,
+    UPLOAD_EXPIRE_SECONDS,
+)
+
+router = APIRouter(prefix="/files/uploads", tags=["files"])
+
+# Limita S3 pentru un singur PUT/POST
+PRESIGN_MAX_SIZE = 5 * 1024 ** 3
+
+
+def _get_upload(db: Session, upload_id: str, user: Principal, multipart: Optional[bool] = None) -> Upload:
+    """multipart=True/False restrange la un singur tip de upload; None = oricare"""
+    query = db.query(Upload).filter(Upload.id == upload_id, Upload.owner_id == user.id)
+    if multipart is not None:
+        query = query.filter(Upload.s3_upload_id.isnot(None) if multipart else Upload.s3_upload_id.is_(None))
+    up = query.first()
+    if not up:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return up
+
+
+def _load_upload(upload_id: str, user: Principal) -> Upload:
+    """Sesiune scurta: conexiunea nu ramane ocupata cat se transfera partea (client -> MinIO)"""
+    with SessionLocal() as db:
+        return _get_upload(db, upload_id, user, multipart=True)
+
+
+def _list_parts(up: Upload) -> List[Part]:
+    """Partile confirmate de S3 pentru upload (sursa de adevar pentru resume)"""
+    parts: List[Part] = []
+    marker = None
+    while True:
+        result = minio_client._list_parts(
+            MINIO_BUCKET, up.object_name, up.s3_upload_id, part_number_marker=marker
+        )
+        parts.extend(result.parts)
+        if not result.is_truncated:
+            break
+        marker = str(result.next_part_number_marker)
+    return sorted(parts, key=lambda p: p.part_number)
+
+
+def _upload_out(up: Upload, parts: List[Part]) -> UploadOut:
+    return UploadOut(
+        id=up.id,
+        object_name=up.object_name,
+        filename=up.filename,
+        size=up.size,
+        part_size=up.part_size,
+        presigned=up.s3_upload_id is None,
+        created_at=up.created_at,
+        expires_at=up.created_at + timedelta(seconds=UPLOAD_EXPIRE_SECONDS) if up.created_at else None,
+        parts=[UploadPartOut(part_number=p.part_number, etag=p.etag, size=p.size or 0) for p in parts],
+    )
+
+
+@router.get("", response_model=List[UploadOut])
+def list_uploads(db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
+    """Uploadurile deschise ale utilizatorului (fara parti): reluare sau DELETE daca s-a pierdut upload_id-ul"""
+    ups = db.query(Upload).filter(Upload.owner_id == user.id).order_by(Upload.created_at).all()
+    return [_upload_out(up, []) for up in ups]
+
+
+@router.post("", response_model=UploadOut, dependencies=[Depends(ratelimit.rate_limit("upload"))])
+def init_upload(payload: UploadInit, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
+    """Porneste un upload multipart; clientul trimite apoi partile in paralel"""
+    if payload.size > UPLOAD_PART_SIZE * UPLOAD_MAX_PARTS:
+        raise HTTPException(status_code=413, detail="File too large")
+    usage.reserve(db, user.id, payload.size)
+
+    object_name = f"u{user.id}/" + payload.filename
+    headers = {"Content-Type": payload.content_type} if payload.content_type else {}
+    s3_upload_id = minio_client._create_multipart_upload(MINIO_BUCKET, object_name, headers)
+
+    up = Upload(
+        id=uuid.uuid4().hex,
+        owner_id=user.id,
+        s3_upload_id=s3_upload_id,
+        object_name=object_name,
+        filename=payload.filename,
+        content_type=payload.content_type,
+        part_size=UPLOAD_PART_SIZE,
+        size=payload.size,
+        created_at=datetime.utcnow(),
+    )
+    db.add(up)
+    db.commit()
+    return _upload_out(up, [])
+
+
+# === Upload direct in MinIO (URL presemnat) ===
+@router.post("/presigned", response_model=PresignedPostOut, dependencies=[Depends(ratelimit.rate_limit("upload"))])
+def presign_upload(payload: PresignUploadIn, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
+    """Formular POST presemnat; bytes merg direct in MinIO, fara workerii Python"""
+    if payload.size > PRESIGN_MAX_SIZE:
+        raise HTTPException(status_code=413, detail="File too large, use a multipart upload")
+    # Dimensiunea declarata e rezervata ca la multipart; MinIO refuza corpurile mai mari (content-length-range)
+    usage.reserve(db, user.id, payload.size)
+    object_name = f"u{user.id}/" + payload.filename
+    policy = PostPolicy(MINIO_BUCKET, datetime.utcnow() + timedelta(seconds=PRESIGN_EXPIRE_SECONDS))
+    policy.add_equals_condition("key", object_name)
+    policy.add_content_length_range_condition(1, payload.size)
+    fields = presign_client.presigned_post_policy(policy)
+
+    up = Upload(
+        id=uuid.uuid4().hex,
+        owner_id=user.id,
+        object_name=object_name,
+        filename=payload.filename,
+        size=payload.size,
+        created_at=datetime.utcnow(),
+    )
+    db.add(up)
+    db.commit()
+    url = f"{'https' if MINIO_PUBLIC_SECURE else 'http'}://{MINIO_PUBLIC_ENDPOINT}/{MINIO_BUCKET}"
+    return PresignedPostOut(
+        url=url, fields={"key": object_name, **fields}, upload_id=up.id, object_name=object_name,
+        max_size=payload.size, expires_in=PRESIGN_EXPIRE_SECONDS,
+    )
+
+
+@router.post("/presigned/complete")
+def complete_presigned_upload(
+    payload: PresignCompleteIn, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)
+):
+    """Apelat de client dupa POST: verifica obiectul in MinIO, creeaza randul File si elibereaza rezervarea"""
+    up = _get_upload(db, payload.upload_id, user, multipart=False)
+    try:
+        stat = minio_client.stat_object(MINIO_BUCKET, up.object_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            raise HTTPException(status_code=404, detail="Object not uploaded")
+        raise
+
+    filename = payload.filename or up.filename
+    rec = (
+        db.query(FileModel)
+        .filter(FileModel.owner_id == user.id, FileModel.object_name == up.object_name)
+        .first()
+    )
+    existing = rec is not None
+    delta = stat.size - ((rec.size or 0) if existing else 0)
+    try:
+        usage.check_quota(db, user.id, delta)
+    except HTTPException:
+        # Obiectul a ajuns deja in MinIO; peste cota nu il pastram (nici rezervarea)
+        usage.discard_upload(db, up)
+        db.commit()
+        raise
+    if rec:
+        rec.size = stat.size
+        rec.filename = filename
+    else:
+        rec = FileModel(owner_id=user.id, object_name=up.object_name, filename=filename, size=stat.size)
+        db.add(rec)
+        jobs.enqueue_for_file(db, rec, stat.content_type)
+    usage.add(db, user.id, delta, 0 if existing else 1)
+    db.delete(up)
+    db.commit()
+    invalidate_counts("files")
+    return {"ok": True, "object": up.object_name, "size": stat.size}
+
+
+@router.get("/{upload_id}", response_model=UploadOut)
+def get_upload(upload_id: str, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
+    """Starea uploadului: partile deja confirmate, pentru reluare dupa o eroare"""
+    up = _get_upload(db, upload_id, user)
+    return _upload_out(up, _list_parts(up) if up.s3_upload_id else [])
+
+
+@router.put("/{upload_id}/parts/{part_number}", response_model=UploadPartOut)
+async def upload_part(
+    request: Request,
+    upload_id: str,
+    part_number: int = Path(..., ge=1, le=UPLOAD_MAX_PARTS),
+    user: Principal = Depends(get_current_user),
+):
+    """Corpul cererii este continutul brut al partii; memoria e limitata la part_size"""
+    up = await run_in_threadpool(_load_upload, upload_id, user)
+    # Partea n acopera [(n-1)*part_size, n*part_size) din dimensiunea declarata la init
+    limit = min(up.part_size, up.size - (part_number - 1) * up.part_size)
+    if limit <= 0:
+        raise HTTPException(status_code=400, detail=f"Part {part_number} is beyond the declared size")
+
+    buf = bytearray()
+    async for chunk in request.stream():
+        buf.extend(chunk)
+        if len(buf) > limit:
+            raise HTTPException(status_code=413, detail=f"Part larger than {limit} bytes")
+    if not buf:
+        raise HTTPException(status_code=400, detail="Empty part")
+
+    etag = await run_in_threadpool(
+        minio_client._upload_part,
+        MINIO_BUCKET, up.object_name, bytes(buf), None, up.s3_upload_id, part_number,
+    )
+    return UploadPartOut(part_number=part_number, etag=etag, size=len(buf))
+
+
+@router.post("/{upload_id}/complete")
+def complete_upload(upload_id: str, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
+    up = _get_upload(db, upload_id, user, multipart=True)
+    parts = _list_parts(up)
+    if not parts:
+        raise HTTPException(status_code=400, detail="No parts uploaded")
+    if [p.part_number for p in parts] != list(range(1, len(parts) + 1)):
+        raise HTTPException(status_code=400, detail="Missing parts")
+    size = sum(p.size or 0 for p in parts)
+    # Reincarcare sub acelasi nume: obiectul e suprascris, randul existent se actualizeaza
+    rec = (
+        db.query(FileModel)
+        .filter(FileModel.owner_id == user.id, FileModel.object_name == up.object_name)
+        .first()
+    )
+    existing = rec is not None
+    delta = size - ((rec.size or 0) if existing else 0)
+    # Inainte de asamblare; peste cota, clientul poate anula uploadul (DELETE)
+    usage.check_quota(db, user.id, delta)
+
+    try:
+        minio_client._complete_multipart_upload(MINIO_BUCKET, up.object_name, up.s3_upload_id, parts)
+    except S3Error as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+    if rec:
+        rec.size = size
+        rec.filename = up.filename
+    else:
+        rec = FileModel(owner_id=user.id, object_name=up.object_name, filename=up.filename, size=size)
+        db.add(rec)
+        jobs.enqueue_for_file(db, rec, up.content_type)
+    usage.add(db, user.id, delta, 0 if existing else 1)
+    db.delete(up)
+    db.commit()
+    invalidate_counts("files")
+    return {"ok": True, "object": up.object_name, "size": size}
+
+
+@router.delete("/{upload_id}")
+def abort_upload(upload_id: str, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
+    up = _get_upload(db, upload_id, user)
+    usage.discard_upload(db, up, strict=True)
+    db.commit()
+    return {"ok": True}
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from datetime import datetime
+from typing import Optional, List, Dict
 
 # === Auth ===
 class Token(BaseModel):
@@ -40,6 +41,91 @@ class PostOut(BaseModel):
     class Config:
         from_attributes = True
 
+class PostsPage(BaseModel):
+    items: List[PostOut]
+    next_cursor: Optional[str] = None
+
+# === Files (Drive) ===
+class UploadInit(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+    size: int = Field(gt=0)
+
+class UploadPartOut(BaseModel):
+    part_number: int
+    etag: str
+    size: int
+
+class UploadOut(BaseModel):
+    id: str
+    object_name: str
+    filename: str
+    size: int
+    part_size: Optional[int] = None  # None pentru POST presemnat
+    presigned: bool = False
+    created_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None  # anulat automat (rezervarea eliberata) dupa acest moment
+    parts: List[UploadPartOut] = []
+
+class PresignUploadIn(BaseModel):
+    filename: str
+    # Rezervata din cota pana la complete/DELETE; MinIO refuza corpurile mai mari
+    size: int = Field(gt=0)
+
+class PresignedPostOut(BaseModel):
+    # Formular POST catre MinIO: campurile `fields` + fisierul in campul "file" (ultimul)
+    url: str
+    fields: Dict[str, str]
+    upload_id: str
+    object_name: str
+    max_size: int
+    expires_in: int
+
+class PresignCompleteIn(BaseModel):
+    upload_id: str
+    filename: Optional[str] = None
+
+class FileByHashChallengeIn(BaseModel):
+    sha256: str = Field(pattern=r"^[0-9a-f]{64}$")
+    size: int = Field(gt=0)
+
+class FileByHashChallengeOut(BaseModel):
+    # proof = sha256 (hex) peste octetii [offset, offset + length) ai fisierului local
+    challenge: str
+    offset: int
+    length: int
+    expires_in: int
+
+class FileByHashIn(BaseModel):
+    sha256: str = Field(pattern=r"^[0-9a-f]{64}$")
+    size: int = Field(gt=0)
+    filename: str
+    # Necesare doar daca utilizatorul nu are deja un fisier cu acest continut
+    challenge: Optional[str] = None
+    proof: Optional[str] = Field(None, pattern=r"^[0-9a-f]{64}$")
+
+class StorageUsageOut(BaseModel):
+    bytes: int
+    files: int
+    quota_bytes: Optional[int] = None
+    remaining_bytes: Optional[int] = None
+
+class JobOut(BaseModel):
+    kind: str
+    status: str
+    attempts: int
+    last_error: Optional[str] = None
+
+class FileDerivedOut(BaseModel):
+    thumbnail_url: Optional[str] = None
+    text_url: Optional[str] = None
+    jobs: List[JobOut]
+
+class PresignedUrlOut(BaseModel):
+    url: str
+    object_name: str
+    expires_in: int
+
 # === Discussions & Messages ===
 class DiscussionCreate(BaseModel):
     title: str
@@ -48,6 +134,42 @@ class MessageCreate(BaseModel):
     discussion_id: int
     body: str
 
+class MessageAuthor(BaseModel):
+    id: int
+    username: str
+
+class MessageOut(BaseModel):
+    id: int
+    discussion_id: int
+    author_id: int
+    body: str
+    created_at: datetime
+    author: Optional[MessageAuthor] = None  # lipseste in modul compact
+
+class MessagesPage(BaseModel):
+    items: List[MessageOut]
+    # Modul compact: autorii o singura data, indexati dupa id
+    authors: Optional[Dict[int, MessageAuthor]] = None
+    before_cursor: Optional[str] = None  # pentru mesaje mai vechi
+    after_cursor: Optional[str] = None   # pentru mesaje mai noi (si polling)
+    has_older: bool = False
+    has_newer: bool = False
+
+# === Search ===
+class SearchHit(BaseModel):
+    type: str  # "post" | "message"
+    id: int
+    # title si snippet sunt HTML sigur: textul e escapat, singurele taguri sunt <mark> (termenii gasiti)
+    title: Optional[str] = None
+    discussion_id: Optional[int] = None
+    snippet: str
+    rank: float
+    created_at: Optional[datetime] = None
+
+class SearchResults(BaseModel):
+    q: str
+    items: List[SearchHit]
+
 # === Status ===
 class StatusCreate(BaseModel):
     text: str
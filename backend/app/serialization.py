@@ -0,0 +1,35 @@
+import json
+from datetime import date, datetime
+from typing import Any, Iterable, List, Sequence
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: fara orjson se foloseste json din stdlib
+    orjson = None
+
+# Cale rapida pentru listele mari: randuri de coloane (nu obiecte ORM) serializate direct,
+# fara re-validare prin response_model. response_model ramane pe rute doar pentru OpenAPI.
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def rows_as_dicts(rows: Iterable[Sequence], fields: Sequence[str]) -> List[dict]:
+    """fields in ordinea coloanelor din select; coloanele in plus de la final sunt ignorate"""
+    return [dict(zip(fields, row)) for row in rows]
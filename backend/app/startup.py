@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from minio.error import S3Error
+
+from .db import engine, SessionLocal, dialect_insert, start_pool_healthcheck, start_replica_healthcheck
+from .models import Base, Role
+from .storage import minio_client, MINIO_BUCKET
+from . import passwords, pubsub, usage
+
+logger = logging.getLogger("uvicorn.error")
+
+# In productie schema e gestionata separat: DB_CREATE_SCHEMA=false sare peste create_all
+DB_CREATE_SCHEMA = os.getenv("DB_CREATE_SCHEMA", "true").lower() == "true"
+DEFAULT_ROLES = ["guest", "user", "admin"]
+
+# Starea initializarii, raportata de /ready
+state = {"db": False, "storage": False, "timings": {}}
+
+
+@contextmanager
+def _phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        state["timings"][name] = round(elapsed, 4)
+        logger.info("startup phase %s took %.1f ms", name, elapsed * 1000)
+
+
+def init_db():
+    if DB_CREATE_SCHEMA:
+        with _phase("db_schema"):
+            Base.metadata.create_all(bind=engine)
+    with _phase("db_seed_roles"):
+        # Un singur INSERT ... ON CONFLICT DO NOTHING pentru toate rolurile
+        with SessionLocal() as db:
+            stmt = dialect_insert(Role.__table__).values([{"name": n} for n in DEFAULT_ROLES])
+            db.execute(stmt.on_conflict_do_nothing(index_elements=["name"]))
+            db.commit()
+    state["db"] = True
+
+
+def init_storage():
+    with _phase("storage_bucket"):
+        try:
+            if not minio_client.bucket_exists(MINIO_BUCKET):
+                minio_client.make_bucket(MINIO_BUCKET)
+            state["storage"] = True
+        except S3Error as e:
+            # Bucket creat intre timp de alt worker
+            state["storage"] = e.code == "BucketAlreadyOwnedByYou"
+        except Exception:
+            logger.warning("storage init failed, will retry on /ready", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with _phase("total"):
+        # DB si MinIO se initializeaza in paralel; o eroare DB opreste pornirea
+        await asyncio.gather(run_in_threadpool(init_db), run_in_threadpool(init_storage))
+        start_pool_healthcheck()
+        start_replica_healthcheck()
+        usage.start_reconcile_loop()
+        pubsub.hub.start(asyncio.get_running_loop())
+        pubsub.start_listener()
+    yield
+    pubsub.stop_listener()
+    passwords.shutdown_pool()
@@ -0,0 +1,67 @@
+import os
+import re
+from typing import Optional, Tuple
+from minio import Minio
+
+# MinIO client setup
+MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "minio:9000")
+MINIO_ROOT_USER = os.getenv("MINIO_ROOT_USER", "minioadmin")
+MINIO_ROOT_PASSWORD = os.getenv("MINIO_ROOT_PASSWORD", "minioadmin")
+MINIO_BUCKET = os.getenv("MINIO_BUCKET", "materials")
+MINIO_SECURE = os.getenv("MINIO_SECURE", "false").lower() == "true"
+MINIO_REGION = os.getenv("MINIO_REGION", "us-east-1")
+
+# URL-uri presemnate: host-ul vazut de browser (prin nginx), nu cel din reteaua docker
+MINIO_PUBLIC_ENDPOINT = os.getenv("MINIO_PUBLIC_ENDPOINT", MINIO_ENDPOINT)
+MINIO_PUBLIC_SECURE = os.getenv("MINIO_PUBLIC_SECURE", str(MINIO_SECURE)).lower() == "true"
+PRESIGN_EXPIRE_SECONDS = int(os.getenv("PRESIGN_EXPIRE_SECONDS", "900"))
+
+# Upload-uri multipart: marimea unei parti (S3 cere minim 5 MiB, exceptand ultima parte)
+UPLOAD_PART_SIZE = max(int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024))), 5 * 1024 * 1024)
+UPLOAD_MAX_PARTS = 10000
+# Uploadurile (multipart sau presemnate) neterminate dupa atat sunt anulate de worker, rezervarea eliberata
+UPLOAD_EXPIRE_SECONDS = int(os.getenv("UPLOAD_EXPIRE_SECONDS", str(24 * 3600)))
+
+# Download: obiectele sunt trimise in bucati de marime fixa, fara buffer complet
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(64 * 1024)))
+
+minio_client = Minio(
+    MINIO_ENDPOINT,
+    access_key=MINIO_ROOT_USER,
+    secret_key=MINIO_ROOT_PASSWORD,
+    secure=MINIO_SECURE,
+)
+
+# Client folosit doar pentru semnare (nu face cereri, de aceea region e fixat)
+presign_client = Minio(
+    MINIO_PUBLIC_ENDPOINT,
+    access_key=MINIO_ROOT_USER,
+    secret_key=MINIO_ROOT_PASSWORD,
+    secure=MINIO_PUBLIC_SECURE,
+    region=MINIO_REGION,
+)
+
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpreteaza un header Range cu un singur interval -> (start, end) inclusiv.
+    None = header ignorat (multi-range/sintaxa necunoscuta), se trimite tot obiectul.
+    ValueError = interval nesatisfiabil (416).
+    """
+    m = _RANGE_RE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    first, last = m.group(1), m.group(2)
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or (last and int(last) < start):
+            raise ValueError("unsatisfiable range")
+    else:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError("unsatisfiable range")
+        start, end = max(size - suffix, 0), size - 1
+    return start, end
@@ -0,0 +1,90 @@
+import html
+import io
+import re
+import zipfile
+import zlib
+from typing import Optional
+
+# Transformari CPU-intensive rulate in procesele worker-ului (app.worker).
+# Modul fara importuri din aplicatie: este incarcat in procesele din pool.
+
+THUMBNAIL_SIZE = (320, 320)
+MAX_TEXT_CHARS = 1_000_000
+# word/document.xml citit cel mult pana aici (un zip bomb se decomprima altfel integral in memorie)
+MAX_DOCX_XML_BYTES = 32 * 1024 * 1024
+
+
+class PermanentError(Exception):
+    """Input pe care o noua incercare nu il poate rezolva (format invalid, dependinta lipsa)"""
+
+
+def make_thumbnail(data: bytes) -> bytes:
+    try:
+        from PIL import Image, UnidentifiedImageError
+        from PIL.Image import DecompressionBombError
+    except ImportError:
+        raise PermanentError("Pillow is not installed")
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.thumbnail(THUMBNAIL_SIZE)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=80, optimize=True)
+            return out.getvalue()
+    except (UnidentifiedImageError, OSError) as e:
+        raise PermanentError(f"not a readable image: {e}")
+    except DecompressionBombError as e:
+        raise PermanentError(f"image too large: {e}")
+
+
+def _pdf_text(data: bytes) -> str:
+    try:
+        from pypdf import PdfReader
+        from pypdf.errors import PdfReadError
+    except ImportError:
+        raise PermanentError("pypdf is not installed")
+    try:
+        reader = PdfReader(io.BytesIO(data))
+        parts, total = [], 0
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            parts.append(text)
+            total += len(text)
+            if total >= MAX_TEXT_CHARS:
+                break
+        return "\n".join(parts)
+    except PdfReadError as e:
+        raise PermanentError(f"not a readable PDF: {e}")
+
+
+def _docx_text(data: bytes) -> str:
+    # .docx = zip cu word/document.xml; paragrafele sunt <w:p>, textul in <w:t>
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            with z.open("word/document.xml") as member:
+                xml = member.read(MAX_DOCX_XML_BYTES).decode("utf-8", errors="replace")
+    except (zipfile.BadZipFile, KeyError, zlib.error) as e:
+        raise PermanentError(f"not a readable DOCX: {e}")
+    paragraphs = re.split(r"</w:p>", xml)
+    return html.unescape("\n".join("".join(re.findall(r"<w:t[^>]*>([^<]*)</w:t>", p)) for p in paragraphs).strip())
+
+
+def extract_text(data: bytes, filename: str) -> str:
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if ext == "pdf":
+        text = _pdf_text(data)
+    elif ext == "docx":
+        text = _docx_text(data)
+    else:
+        text = data.decode("utf-8", errors="replace")
+    return text[:MAX_TEXT_CHARS]
+
+
+def run(kind: str, data: bytes, filename: str) -> Optional[bytes]:
+    """Punctul de intrare din pool: rezultatul, gata de scris in MinIO"""
+    if kind == "thumbnail":
+        return make_thumbnail(data)
+    if kind == "extract_text":
+        return extract_text(data, filename).encode("utf-8")
+    raise PermanentError(f"unknown job kind {kind}")
@@ -0,0 +1,251 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import groupby
+from fastapi import HTTPException, status
+from minio.error import S3Error
+from sqlalchemy import DateTime, func, literal, null, select, text, union_all, update
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal, dialect_insert
+from .models import File as FileModel, StorageUsage, Blob, Upload
+from .storage import minio_client, MINIO_BUCKET, UPLOAD_EXPIRE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Cota implicita per utilizator (bytes); 0 = nelimitat. Suprascrisa per user prin storage_usage.quota_bytes
+STORAGE_QUOTA_BYTES = int(os.getenv("STORAGE_QUOTA_BYTES", str(1024 ** 3)))
+# Reconciliere periodica cu MinIO (secunde); 0 = doar manual (POST /admin/storage/reconcile)
+USAGE_RECONCILE_INTERVAL = int(os.getenv("USAGE_RECONCILE_INTERVAL", "0"))
+# Obiectele temporare mai noi de atat pot apartine unui upload in curs
+ORPHAN_GRACE = timedelta(hours=1)
+
+
+# === Contoare ===
+def add(db: Session, user_id: int, delta_bytes: int, delta_files: int):
+    """Actualizeaza contorul in tranzactia curenta (apelantul face commit odata cu randul File)"""
+    table = StorageUsage.__table__
+    stmt = dialect_insert(table).values(
+        user_id=user_id, bytes=max(delta_bytes, 0), files=max(delta_files, 0), updated_at=datetime.utcnow()
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={
+            "bytes": table.c.bytes + delta_bytes,
+            "files": table.c.files + delta_files,
+            "updated_at": datetime.utcnow(),
+        },
+    ))
+
+
+def get(db: Session, user_id: int) -> dict:
+    row = db.get(StorageUsage, user_id)
+    used = row.bytes if row else 0
+    quota = row.quota_bytes if row and row.quota_bytes is not None else STORAGE_QUOTA_BYTES
+    return {
+        "bytes": used,
+        "files": row.files if row else 0,
+        "quota_bytes": quota or None,
+        "remaining_bytes": max(quota - used, 0) if quota else None,
+    }
+
+
+def check_quota(db: Session, user_id: int, incoming: int):
+    """Un singur rand citit (cheie primara), fara SUM peste files; apelat inainte de transferul in MinIO"""
+    usage = get(db, user_id)
+    if usage["quota_bytes"] is not None and usage["bytes"] + incoming > usage["quota_bytes"]:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Storage quota exceeded ({usage['remaining_bytes']} bytes remaining)",
+        )
+
+
+# === Rezervari (uploaduri in curs) ===
+def reserve(db: Session, user_id: int, size: int):
+    """
+    Cota pentru un upload nou, numarand si rezervarile deschise (multipart si POST presemnat):
+    nu se poate ocoli cota cu mai multe init-uri. Apelantul adauga randul Upload si face commit.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # Doua rezervari concurente ale aceluiasi user nu pot vedea amandoua acelasi spatiu liber
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"upload_reserve:{user_id}"})
+    pending = db.execute(
+        select(func.coalesce(func.sum(Upload.size), 0)).where(Upload.owner_id == user_id)
+    ).scalar_one()
+    check_quota(db, user_id, size + pending)
+
+
+def discard_upload(db: Session, up: Upload, strict: bool = False):
+    """
+    Elibereaza rezervarea: anuleaza multipart-ul sau sterge obiectul trimis prin POST presemnat
+    (daca nu a devenit deja fisier). Apelantul face commit. strict=False ignora erorile MinIO.
+    """
+    try:
+        if up.s3_upload_id:
+            minio_client._abort_multipart_upload(MINIO_BUCKET, up.object_name, up.s3_upload_id)
+        elif db.execute(select(FileModel.id).where(FileModel.object_name == up.object_name).limit(1)).first() is None:
+            minio_client.remove_object(MINIO_BUCKET, up.object_name)
+    except S3Error as e:
+        if strict and e.code != "NoSuchUpload":
+            raise
+        logger.warning("discarding upload %s: %s", up.id, e)
+    db.delete(up)
+
+
+def expire_uploads(batch: int = 100) -> int:
+    """Anuleaza uploadurile mai vechi de UPLOAD_EXPIRE_SECONDS (upload_id pierdut de client); apelat de worker"""
+    cutoff = datetime.utcnow() - timedelta(seconds=UPLOAD_EXPIRE_SECONDS)
+    expired = 0
+    while True:
+        with SessionLocal() as db:
+            ups = db.execute(
+                select(Upload).where(Upload.created_at < cutoff)
+                .order_by(Upload.created_at).limit(batch)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            for up in ups:
+                discard_upload(db, up)
+            db.commit()
+        expired += len(ups)
+        if len(ups) < batch:
+            break
+    if expired:
+        logger.info("expired %s abandoned uploads", expired)
+    return expired
+
+
+# === Reconciliere ===
+def _orphan(obj, cutoff: datetime) -> bool:
+    return obj.last_modified is None or obj.last_modified.replace(tzinfo=None) < cutoff
+
+
+def _recompute_counters(db: Session) -> int:
+    """
+    Reface contoarele din files. Randurile storage_usage sunt blocate intai: un upload/stergere
+    concurent fie a terminat (SUM-ul il vede), fie asteapta si isi aplica delta peste valoarea noua.
+    """
+    table = StorageUsage.__table__
+    db.execute(select(table.c.user_id).order_by(table.c.user_id).with_for_update()).all()
+
+    owned = FileModel.owner_id == table.c.user_id
+    total = select(func.coalesce(func.sum(FileModel.size), 0)).where(owned).scalar_subquery()
+    count = select(func.count()).where(owned).scalar_subquery()
+    now = datetime.utcnow()
+    corrected = db.execute(
+        update(table)
+        .where((table.c.bytes != total) | (table.c.files != count))
+        .values(bytes=total, files=count, updated_at=now)
+    ).rowcount
+
+    # Proprietari fara rand in storage_usage
+    missing_rows = (
+        select(FileModel.owner_id, func.coalesce(func.sum(FileModel.size), 0), func.count(), literal(now, DateTime))
+        .where(FileModel.owner_id.isnot(None), ~select(table.c.user_id).where(owned).exists())
+        .group_by(FileModel.owner_id)
+    )
+    corrected += db.execute(
+        dialect_insert(table)
+        .from_select(["user_id", "bytes", "files", "updated_at"], missing_rows)
+        .on_conflict_do_nothing(index_elements=["user_id"])
+    ).rowcount
+    return corrected
+
+
+def reconcile() -> dict:
+    """
+    Compara files cu listarea obiectelor din MinIO si reface contoarele din files.
+    Corecteaza dimensiunile diferite de cele din MinIO; obiectele lipsa si orfanii sunt doar raportate.
+    Listarea e parcursa in flux, interclasata cu numele cunoscute din files/blobs (ambele ordonate dupa cheie).
+    """
+    with SessionLocal() as db:
+        postgres = db.get_bind().dialect.name == "postgresql"
+        if postgres:
+            # Un singur worker reconciliaza la un moment dat
+            if not db.execute(text("SELECT pg_try_advisory_xact_lock(hashtext('storage_usage_reconcile'))")).scalar():
+                return {"skipped": "already running"}
+
+        # Aceeasi ordine ca listarea S3 (octeti UTF-8), indiferent de colatia bazei
+        # Artefactele derivate (thumbnail, text) sunt cunoscute, dar nu au dimensiune de verificat
+        names = union_all(
+            select(FileModel.object_name.label("name"), FileModel.id, FileModel.size),
+            select(Blob.object_name, null(), null()),
+            select(FileModel.thumbnail_object, null(), null()).where(FileModel.thumbnail_object.isnot(None)),
+            select(FileModel.text_object, null(), null()).where(FileModel.text_object.isnot(None)),
+        ).subquery()
+        order = names.c.name.collate("C") if postgres else names.c.name
+        rows = db.execute(select(names).order_by(order).execution_options(yield_per=1000))
+
+        objects = iter(minio_client.list_objects(MINIO_BUCKET, recursive=True))
+        obj = next(objects, None)
+        cutoff = datetime.utcnow() - ORPHAN_GRACE
+        object_count, orphans, orphan_count = 0, [], 0
+        missing, missing_count = [], 0
+        size_fixes = []
+
+        def skip_orphan():
+            nonlocal obj, object_count, orphan_count
+            object_count += 1
+            if _orphan(obj, cutoff):
+                orphan_count += 1
+                if len(orphans) < 100:
+                    orphans.append(obj.object_name)
+            obj = next(objects, None)
+
+        for name, group in groupby(rows, key=lambda row: row.name):
+            while obj is not None and obj.object_name < name:
+                skip_orphan()
+            file_rows = [(file_id, size) for _, file_id, size in group if file_id is not None]
+            if obj is not None and obj.object_name == name:
+                if any(size != obj.size for _, size in file_rows):
+                    size_fixes.append((name, obj.size))
+                object_count += 1
+                obj = next(objects, None)
+            else:
+                missing_count += len(file_rows)
+                missing.extend(file_id for file_id, _ in file_rows[:100 - len(missing)])
+        while obj is not None:
+            skip_orphan()
+
+        size_mismatches = 0
+        for name, size in size_fixes:
+            size_mismatches += db.execute(
+                update(FileModel).where(FileModel.object_name == name, FileModel.size != size).values(size=size)
+            ).rowcount
+
+        corrected = _recompute_counters(db)
+        db.commit()
+
+    report = {
+        "objects": object_count,
+        "size_mismatches_fixed": size_mismatches,
+        "missing_objects": missing,
+        "missing_objects_count": missing_count,
+        "orphan_objects": orphans,
+        "orphan_objects_count": orphan_count,
+        "counters_corrected": corrected,
+    }
+    if size_mismatches or missing_count or orphan_count or corrected:
+        logger.warning("storage usage reconciliation: %s", {k: v for k, v in report.items() if not isinstance(v, list)})
+    return report
+
+
+_reconcile_started = False
+
+def start_reconcile_loop():
+    """Porneste (o singura data) reconcilierea periodica, daca e configurata"""
+    global _reconcile_started
+    if USAGE_RECONCILE_INTERVAL <= 0 or _reconcile_started:
+        return
+    _reconcile_started = True
+
+    def loop():
+        while True:
+            time.sleep(USAGE_RECONCILE_INTERVAL)
+            try:
+                reconcile()
+            except Exception:
+                logger.warning("storage usage reconciliation failed", exc_info=True)
+
+    threading.Thread(target=loop, name="storage-usage-reconcile", daemon=True).start()
@@ -0,0 +1,181 @@
+# Worker pentru joburile de fundal (thumbnails, extragere text).
+#
+#   python -m app.worker
+#
+# Preia joburi din tabela jobs (SKIP LOCKED: se pot rula mai multe instante), descarca obiectul
+# din MinIO, ruleaza transformarea intr-un pool de procese si scrie rezultatul inapoi in MinIO.
+# Periodic anuleaza si uploadurile abandonate (usage.expire_uploads), eliberand cota rezervata.
+
+import io
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from minio.error import S3Error
+
+from . import jobs, transforms, usage
+from .storage import minio_client, MINIO_BUCKET
+
+logger = logging.getLogger("app.worker")
+
+JOB_WORKER_PROCESSES = int(os.getenv("JOB_WORKER_PROCESSES", str(os.cpu_count() or 2)))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+# Fisierele mai mari nu sunt procesate (ar fi citite integral in memorie)
+JOB_MAX_INPUT_BYTES = int(os.getenv("JOB_MAX_INPUT_BYTES", str(100 * 1024 * 1024)))
+# Cat de des se cauta uploadurile abandonate (usage.expire_uploads)
+UPLOAD_EXPIRE_CHECK_INTERVAL = float(os.getenv("UPLOAD_EXPIRE_CHECK_INTERVAL", "300"))
+
+_stop = threading.Event()
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+# === Pool ===
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=JOB_WORKER_PROCESSES, mp_context=multiprocessing.get_context("forkserver")
+        )
+    return _pool
+
+def _discard_pool(broken: ProcessPoolExecutor):
+    """Un proces a murit (OOM, segfault intr-un decoder): pool-ul e inutilizabil, urmatorul submit creeaza altul"""
+    global _pool
+    if _pool is broken:
+        _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def _submit(*args):
+    for retry in (False, True):
+        pool = _get_pool()
+        try:
+            return pool, pool.submit(*args)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            if retry:
+                raise
+
+
+def _exists(object_name: str) -> bool:
+    try:
+        minio_client.stat_object(MINIO_BUCKET, object_name)
+        return True
+    except S3Error:
+        return False
+
+
+def _read(object_name: str) -> bytes:
+    obj = minio_client.get_object(MINIO_BUCKET, object_name)
+    try:
+        return obj.read()
+    finally:
+        obj.close()
+        obj.release_conn()
+
+
+def _prepare(job):
+    """(date, cheie rezultat) sau None daca jobul e deja rezolvat/imposibil (marcat aici)"""
+    if job.object_name is None:
+        jobs.complete(job, None)  # fisierul a fost sters intre timp
+        return None
+    if (job.size or 0) > JOB_MAX_INPUT_BYTES:
+        jobs.fail(job, f"input larger than {JOB_MAX_INPUT_BYTES} bytes", permanent=True)
+        return None
+    _, name, _ = jobs.OUTPUTS[job.kind]
+    output = f"{jobs.derived_key(job)}/{name}"
+    if job.sha256 and _exists(output):
+        # Acelasi continut a fost deja procesat (fisier deduplicat)
+        jobs.complete(job, output)
+        return None
+    return _read(job.object_name), output
+
+
+def _finish(job, output: str, pool: ProcessPoolExecutor, future):
+    try:
+        result = future.result()
+        content_type = jobs.OUTPUTS[job.kind][2]
+        minio_client.put_object(MINIO_BUCKET, output, io.BytesIO(result), len(result), content_type=content_type)
+        jobs.complete(job, output)
+    except transforms.PermanentError as e:
+        logger.warning("job %s (%s) failed permanently: %s", job.id, job.kind, e)
+        jobs.fail(job, str(e), permanent=True)
+    except BrokenProcessPool:
+        # Toate joburile din pool-ul cazut ajung aici; se reincearca (max_attempts opreste un input care omoara procesul)
+        logger.warning("job %s (%s): transform process died, attempt %s", job.id, job.kind, job.attempts)
+        _discard_pool(pool)
+        jobs.fail(job, "transform process died")
+    except Exception as e:
+        logger.warning("job %s (%s) failed, attempt %s", job.id, job.kind, job.attempts, exc_info=True)
+        jobs.fail(job, f"{type(e).__name__}: {e}")
+
+
+def run_batch(worker_id: str) -> int:
+    batch = jobs.claim(worker_id, JOB_WORKER_PROCESSES * 2)
+    # Cel mult JOB_WORKER_PROCESSES intrari in memorie: fiecare e descarcata chiar inainte de submit,
+    # dupa ce s-a eliberat un loc (varf ~ procese x JOB_MAX_INPUT_BYTES, nu tot lotul)
+    pending = deque()
+    for job in batch:
+        while len(pending) >= JOB_WORKER_PROCESSES:
+            wait([f for *_, f in pending], return_when=FIRST_COMPLETED)
+            for item in [item for item in pending if item[-1].done()]:
+                pending.remove(item)
+                _finish(*item)
+        try:
+            prepared = _prepare(job)
+        except Exception as e:
+            jobs.fail(job, f"download failed: {e}")
+            continue
+        if prepared:
+            data, output = prepared
+            try:
+                pool, future = _submit(transforms.run, job.kind, data, job.filename)
+            except BrokenProcessPool:
+                jobs.fail(job, "transform process pool unavailable")
+                continue
+            pending.append((job, output, pool, future))
+            del data, prepared
+
+    for item in pending:
+        _finish(*item)
+    return len(batch)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    # SIGTERM (docker stop): se termina lotul curent, apoi iesire
+    signal.signal(signal.SIGTERM, lambda *_: _stop.set())
+    signal.signal(signal.SIGINT, lambda *_: _stop.set())
+    logger.info("worker %s started with %s processes", worker_id, JOB_WORKER_PROCESSES)
+    next_expiry = 0.0
+    try:
+        while not _stop.is_set():
+            if time.monotonic() >= next_expiry:
+                next_expiry = time.monotonic() + UPLOAD_EXPIRE_CHECK_INTERVAL
+                try:
+                    usage.expire_uploads()
+                except Exception:
+                    logger.exception("upload expiry failed")
+            try:
+                claimed = run_batch(worker_id)
+            except Exception:
+                logger.exception("worker loop error")
+                claimed = 0
+            if not claimed:
+                _stop.wait(JOB_POLL_INTERVAL)
+    finally:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        logger.info("worker %s stopped", worker_id)
+
+
+if __name__ == "__main__":
+    main()
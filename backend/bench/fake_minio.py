@@ -0,0 +1,123 @@
+# Inlocuitor in memorie pentru minio.Minio: aceleasi metode pe care le foloseste aplicatia,
+# fara retea, ca benchmark-ul sa masoare doar backend-ul.
+
+import hashlib
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from minio.datatypes import Part
+from minio.error import S3Error
+
+
+class _Object:
+    """Ca urllib3.HTTPResponse: read() si stream() consuma acelasi corp"""
+
+    def __init__(self, data: bytes):
+        self._data = data
+        self._pos = 0
+
+    def read(self, amt=None) -> bytes:
+        end = len(self._data) if amt is None else self._pos + amt
+        chunk, self._pos = self._data[self._pos:end], min(end, len(self._data))
+        return chunk
+
+    def stream(self, amt: int):
+        while self._pos < len(self._data):
+            yield self.read(amt)
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class FakeMinio:
+    def __init__(self, *args, **kwargs):
+        self.objects = {}
+        self.uploads = {}
+        self._lock = threading.Lock()
+
+    def _missing(self, name: str):
+        return S3Error("NoSuchKey", "Object does not exist", name, None, None, None)
+
+    # === Bucket / obiecte ===
+    def bucket_exists(self, bucket):
+        return True
+
+    def make_bucket(self, bucket, *args, **kwargs):
+        pass
+
+    def put_object(self, bucket, name, data, length, content_type="application/octet-stream", **kwargs):
+        body = data.read() if length < 0 else data.read(length)
+        with self._lock:
+            self.objects[name] = (body, content_type, datetime.now(timezone.utc))
+        return SimpleNamespace(etag=hashlib.md5(body).hexdigest(), object_name=name)
+
+    def stat_object(self, bucket, name, *args, **kwargs):
+        if name not in self.objects:
+            raise self._missing(name)
+        body, content_type, modified = self.objects[name]
+        return SimpleNamespace(
+            size=len(body), etag=hashlib.md5(body).hexdigest(), content_type=content_type, last_modified=modified
+        )
+
+    def get_object(self, bucket, name, offset=0, length=0, **kwargs):
+        if name not in self.objects:
+            raise self._missing(name)
+        body = self.objects[name][0]
+        return _Object(body[offset:offset + length] if length else body[offset:])
+
+    def copy_object(self, bucket, name, source, *args, **kwargs):
+        if source.object_name not in self.objects:
+            raise self._missing(source.object_name)
+        with self._lock:
+            self.objects[name] = self.objects[source.object_name]
+        return SimpleNamespace(etag=hashlib.md5(self.objects[name][0]).hexdigest(), object_name=name)
+
+    def remove_object(self, bucket, name, *args, **kwargs):
+        with self._lock:
+            self.objects.pop(name, None)
+
+    def list_objects(self, bucket, prefix=None, recursive=False, **kwargs):
+        # S3 listeaza cheile in ordine lexicografica (usage.reconcile se bazeaza pe asta)
+        for name, (body, _, modified) in sorted(self.objects.items()):
+            if not prefix or name.startswith(prefix):
+                yield SimpleNamespace(object_name=name, size=len(body), last_modified=modified)
+
+    def presigned_get_object(self, bucket, name, *args, **kwargs):
+        return f"http://fake-minio/{bucket}/{name}?X-Amz-Signature=bench"
+
+    def presigned_put_object(self, bucket, name, *args, **kwargs):
+        return f"http://fake-minio/{bucket}/{name}?X-Amz-Signature=bench"
+
+    def presigned_post_policy(self, policy):
+        return {"policy": "bench", "x-amz-signature": "bench"}
+
+    # === Multipart ===
+    def _create_multipart_upload(self, bucket, name, headers):
+        with self._lock:
+            upload_id = f"upload-{len(self.uploads) + 1}"
+            self.uploads[upload_id] = {}
+        return upload_id
+
+    def _upload_part(self, bucket, name, data, headers, upload_id, part_number):
+        self.uploads[upload_id][part_number] = data
+        return hashlib.md5(data).hexdigest()
+
+    def _list_parts(self, bucket, name, upload_id, part_number_marker=None, **kwargs):
+        parts = [
+            Part(n, hashlib.md5(d).hexdigest(), None, len(d)) for n, d in sorted(self.uploads[upload_id].items())
+        ]
+        return SimpleNamespace(parts=parts, is_truncated=False, next_part_number_marker=None)
+
+    def _complete_multipart_upload(self, bucket, name, upload_id, parts):
+        data = self.uploads.pop(upload_id)
+        with self._lock:
+            self.objects[name] = (
+                b"".join(data[p.part_number] for p in parts), "application/octet-stream", datetime.now(timezone.utc)
+            )
+
+    def _abort_multipart_upload(self, bucket, name, upload_id):
+        self.uploads.pop(upload_id, None)
@@ -0,0 +1,309 @@
+# Benchmark pentru endpoint-urile principale.
+#
+#   cd backend && python -m bench.run --users 2000 --posts 20000 --out bench/baseline.json
+#   python -m bench.run --compare bench/baseline.json --fail-over 20
+#
+# Porneste app.main:app cu uvicorn intr-un thread, pe o baza de date de unica folosinta
+# (SQLite temporar implicit, sau --database-url catre un Postgres local) si cu un MinIO fals
+# in memorie. Raporteaza req/s, latente p50/p95/p99 si query-uri SQL per cerere.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmark endpoint-uri backend")
+    # BENCH_DATABASE_URL: procesele din pool-ul de parole reimporta modulul si refolosesc aceeasi baza
+    p.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                   help="implicit: SQLite intr-un director temporar")
+    p.add_argument("--reset", action="store_true", help="sterge tabelele inainte (pentru un Postgres refolosit)")
+    p.add_argument("--users", type=int, default=500)
+    p.add_argument("--posts", type=int, default=5000)
+    p.add_argument("--discussions", type=int, default=20)
+    p.add_argument("--messages", type=int, default=5000)
+    p.add_argument("--files", type=int, default=2000)
+    p.add_argument("--requests", type=int, default=500, help="cereri per scenariu")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--bcrypt-rounds", type=int, default=4, help="costul real (12) face login-ul sa domine rularea")
+    p.add_argument("--rate-limit", action="store_true", help="pastreaza rate limiting-ul (implicit oprit: un singur IP)")
+    p.add_argument("--no-response-cache", action="store_true", help="GET /posts construit la fiecare cerere")
+    p.add_argument("--only", help="scenarii separate prin virgula")
+    p.add_argument("--out", help="salveaza rezultatele ca baseline JSON")
+    p.add_argument("--compare", help="baseline JSON cu care se compara")
+    p.add_argument("--fail-over", type=float, help="exit 1 daca p95 creste cu mai mult de atatea procente")
+    return p.parse_args()
+
+
+args = parse_args()
+
+# Configurarea se face inainte de importul aplicatiei (modulele citesc env la import)
+if not args.database_url:
+    args.database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.db")
+os.environ["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"] = args.database_url
+os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+os.environ["RATE_LIMIT_ENABLED"] = str(args.rate_limit).lower()
+if args.no_response_cache:
+    os.environ["RESPONSE_CACHE_TTL"] = "0"
+os.environ.setdefault("PASSWORD_POOL_MAX_PENDING", str(max(32, args.concurrency * 2)))
+
+import minio  # noqa: E402
+from bench.fake_minio import FakeMinio  # noqa: E402
+
+minio.Minio = FakeMinio
+
+import uvicorn  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.db import engine, SessionLocal  # noqa: E402
+from app.models import Base, User, Role, Post, File as FileModel, Discussion, Message, user_roles  # noqa: E402
+from app.instrumentation import request_queries  # noqa: E402
+from app.passwords import hash_password  # noqa: E402
+
+PASSWORD = "bench-password"
+
+
+# === Server ===
+def start_server() -> tuple:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            sys.exit("server failed to start")
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+# === Date ===
+def _batches(rows, size=5000):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+def seed():
+    """Volume parametrizate, inserate in bloc (nu prin API: seed-ul nu face parte din masuratoare)"""
+    pw = hash_password(PASSWORD)
+    with SessionLocal() as db:
+        roles = {name: id for id, name in db.execute(select(Role.id, Role.name))}
+        db.execute(insert(User), [
+            {"username": f"bench{i}", "email": f"bench{i}@example.com", "password_hash": pw}
+            for i in range(args.users)
+        ])
+        admin = User(username="bench-admin", email="bench-admin@example.com", password_hash=pw)
+        db.add(admin)
+        db.flush()
+        ids = db.execute(select(User.id).where(User.username.like("bench%"))).scalars().all()
+        for chunk in _batches([{"user_id": i, "role_id": roles["user"]} for i in ids]):
+            db.execute(insert(user_roles), chunk)
+        db.execute(insert(user_roles), [
+            {"user_id": admin.id, "role_id": roles["admin"]},
+            {"user_id": admin.id, "role_id": roles["administrator"]},
+        ])
+
+        n = len(ids)
+        for chunk in _batches([
+            {"author_id": ids[i % n], "title": f"Post {i}", "content": "lorem ipsum " * 20, "is_public": i % 4 != 0}
+            for i in range(args.posts)
+        ]):
+            db.execute(insert(Post), chunk)
+        # Fisierele apartin utilizatorilor cu token din scenarii: files_list intoarce liste mari
+        owners = ids[:min(n, args.concurrency)]
+        for chunk in _batches([
+            {"owner_id": owners[i % len(owners)], "object_name": f"u{owners[i % len(owners)]}/seed-{i}.bin",
+             "filename": f"seed-{i}.bin", "size": 1024}
+            for i in range(args.files)
+        ]):
+            db.execute(insert(FileModel), chunk)
+        db.execute(insert(Discussion), [
+            {"title": f"Discussion {i}", "created_by": ids[i % n]} for i in range(max(1, args.discussions))
+        ])
+        discussion_ids = db.execute(select(Discussion.id)).scalars().all()
+        for chunk in _batches([
+            {"discussion_id": discussion_ids[i % len(discussion_ids)], "author_id": ids[i % n], "body": f"msg {i}"}
+            for i in range(args.messages)
+        ]):
+            db.execute(insert(Message), chunk)
+        db.commit()
+    return discussion_ids
+
+
+def ensure_roles():
+    # 'administrator' e rolul cerut de routers/admin.py; nu e creat la startup
+    with SessionLocal() as db:
+        if not db.execute(select(Role.id).where(Role.name == "administrator")).first():
+            db.add(Role(name="administrator"))
+            db.commit()
+
+
+# === Scenarii: nume -> (client, i) -> cererea numarul i ===
+def scenarios(tokens, admin_token, discussion_ids):
+    def auth(i):
+        return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    payload = os.urandom(4096)
+    return {
+        "login": lambda c, i: c.post(
+            "/auth/login", data={"username": f"bench{i % args.users}", "password": PASSWORD}),
+        "users_me": lambda c, i: c.get("/users/me", headers=auth(i)),
+        "posts": lambda c, i: c.get("/posts", params={"limit": 20}),
+        "posts_large": lambda c, i: c.get("/posts", params={"limit": 100}),
+        "files_upload": lambda c, i: c.post(
+            "/files/upload", files={"f": (f"bench-{i}.bin", payload)}, headers=auth(i)),
+        "files_list": lambda c, i: c.get("/files", headers=auth(i)),
+        "messages_post": lambda c, i: c.post(
+            "/messages", json={"discussion_id": discussion_ids[i % len(discussion_ids)], "body": f"bench {i}"},
+            headers=auth(i)),
+        "messages_list": lambda c, i: c.get(
+            f"/discussions/{discussion_ids[i % len(discussion_ids)]}/messages", headers=auth(i)),
+        "admin_users": lambda c, i: c.get("/admin/users", params={"page": 1 + i % 5, "page_size": 50}, headers=admin),
+        "admin_users_search": lambda c, i: c.get(
+            "/admin/users", params={"q": f"bench{i % 100}", "page_size": 50}, headers=admin),
+        "admin_users_large": lambda c, i: c.get(
+            "/admin/users", params={"page": 1 + i % 3, "page_size": 200}, headers=admin),
+    }
+
+
+def _queries_total() -> float:
+    return sum(child.sum for child in request_queries._children.values())
+
+
+async def drive(base_url: str, make, total: int, concurrency: int) -> dict:
+    latencies, statuses = [], {}
+    counter = iter(range(total))
+
+    async def worker(client):
+        for i in counter:
+            start = time.perf_counter()
+            r = await make(client, i)
+            latencies.append(time.perf_counter() - start)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        queries_before = _queries_total()
+        # CPU server = CPU proces - CPU thread-ul clientului (clientul httpx ruleaza doar in acest thread).
+        # Hash-urile bcrypt ruleaza in procese separate si nu sunt incluse.
+        cpu_before, client_cpu_before = time.process_time(), time.thread_time()
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        server_cpu = (time.process_time() - cpu_before) - (time.thread_time() - client_cpu_before)
+        queries = _queries_total() - queries_before
+
+    q = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": total,
+        "errors": sum(n for code, n in statuses.items() if code >= 400),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(q[49] * 1000, 2),
+        "p95_ms": round(q[94] * 1000, 2),
+        "p99_ms": round(q[98] * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "queries_per_request": round(queries / total, 2),
+        "cpu_ms_per_request": round(server_cpu / total * 1000, 3),
+    }
+
+
+async def login_tokens(base_url: str, usernames) -> list:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        tokens = []
+        for u in usernames:
+            r = await client.post("/auth/login", data={"username": u, "password": PASSWORD})
+            r.raise_for_status()
+            tokens.append(r.json()["access_token"])
+        return tokens
+
+
+# === Raport ===
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_table(results: dict, baseline=None):
+    head = f"{'scenario':<20}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'q/req':>7}{'cpu ms':>8}{'err':>6}"
+    print(head + ("   p95 / cpu vs baseline" if baseline else ""))
+    for name, r in results.items():
+        line = (f"{name:<20}{r['throughput_rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+                f"{r['queries_per_request']:>7}{r['cpu_ms_per_request']:>8}{r['errors']:>6}")
+        base = (baseline or {}).get(name)
+        if base:
+            line += f"   {_delta(base['p95_ms'], r['p95_ms']):+.1f}%"
+            if "cpu_ms_per_request" in base:
+                line += f" / {_delta(base['cpu_ms_per_request'], r['cpu_ms_per_request']):+.1f}%"
+        print(line)
+
+def _delta(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def main():
+    if args.reset:
+        Base.metadata.drop_all(engine)
+    server, thread, base_url = start_server()
+    try:
+        ensure_roles()
+        discussion_ids = seed()
+        tokens = asyncio.run(login_tokens(base_url, [f"bench{i}" for i in range(min(args.users, args.concurrency))]))
+        admin_token = asyncio.run(login_tokens(base_url, ["bench-admin"]))[0]
+
+        results = {}
+        selected = set(args.only.split(",")) if args.only else None
+        for name, make in scenarios(tokens, admin_token, discussion_ids).items():
+            if selected and name not in selected:
+                continue
+            results[name] = asyncio.run(drive(base_url, make, args.requests, args.concurrency))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+
+    if args.out:
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "database": engine.dialect.name,
+                "python": platform.python_version(),
+                "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "database_url")},
+            },
+            "results": results,
+        }
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline saved to {args.out}")
+
+    if baseline and args.fail_over is not None:
+        regressed = [n for n, r in results.items() if n in baseline
+                     and _delta(baseline[n]["p95_ms"], r["p95_ms"]) > args.fail_over]
+        if regressed:
+            print(f"p95 regression over {args.fail_over}%: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Teste de integrare: aplicatia reala pe un SQLite temporar si MinIO-ul fals din bench.
+#
+#   cd backend && python -m pytest -q tests
+
+import os
+import tempfile
+
+# Configurarea se face inainte de importul aplicatiei (modulele citesc env la import)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="tests-"), "test.db")
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["PASSWORD_POOL_WORKERS"] = "2"
+
+import minio  # noqa: E402
+import pytest  # noqa: E402
+from bench.fake_minio import FakeMinio  # noqa: E402
+
+minio.Minio = FakeMinio
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.auth import invalidate_principal  # noqa: E402
+from app.db import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Role, User  # noqa: E402
+from app.storage import minio_client  # noqa: E402
+
+PASSWORD = "test-password"
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def storage():
+    return minio_client
+
+
+def login(client, username: str, *roles: str) -> dict:
+    """Inregistreaza (daca e nevoie) si autentifica; intoarce headerele de autorizare"""
+    client.post("/auth/register", json={"email": f"{username}@example.com", "username": username, "password": PASSWORD})
+    if roles:
+        grant(username, *roles)
+    r = client.post("/auth/login", data={"username": username, "password": PASSWORD})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+def grant(username: str, *roles: str):
+    """Roluri adaugate direct in DB (rolurile lipsa sunt create), cu invalidarea principalului din cache"""
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.username == username).one()
+        for name in roles:
+            role = db.query(Role).filter(Role.name == name).first() or Role(name=name)
+            if role not in user.roles:
+                user.roles.append(role)
+        db.commit()
+    invalidate_principal(username)
@@ -0,0 +1,33 @@
+from tests.conftest import login
+
+
+def test_admin_files_search(client):
+    owner = login(client, "files-owner")
+    for name in ("Lecture-Notes.txt", "notes-week2.txt", "syllabus.pdf"):
+        assert client.post("/files/upload", files={"f": (name, name.encode())}, headers=owner).status_code == 200
+    admin = login(client, "files-admin", "administrator")
+
+    r = client.get("/admin/files", params={"q": "NOTES"}, headers=admin)
+    assert r.status_code == 200, r.text
+    page = r.json()
+    assert sorted(i["filename"] for i in page["items"]) == ["Lecture-Notes.txt", "notes-week2.txt"]
+    assert page["total"] == 2 and page["items"][0]["owner_username"] == "files-owner"
+
+    owner_id = page["items"][0]["owner_id"]
+    r = client.get("/admin/files", params={"user_id": owner_id, "page_size": 1}, headers=admin)
+    assert r.json()["total"] == 3 and len(r.json()["items"]) == 1
+
+    assert client.get("/admin/files", headers=owner).status_code == 403
+
+
+def test_admin_files_cached_count(client):
+    owner = login(client, "count-owner")
+    admin = login(client, "count-admin", "administrator")
+    params = {"count_strategy": "cached"}
+    first = client.get("/admin/files", params=params, headers=admin).json()
+    assert client.get("/admin/files", params=params, headers=admin).json()["total_strategy"] == "cached"
+
+    # Un upload invalideaza totalul memorat
+    assert client.post("/files/upload", files={"f": ("count.txt", b"x")}, headers=owner).status_code == 200
+    after = client.get("/admin/files", params=params, headers=admin).json()
+    assert after["total"] == first["total"] + 1 and after["total_strategy"] == "exact"
@@ -0,0 +1,43 @@
+import hashlib
+import os
+
+from tests.conftest import login
+
+
+def by_hash(client, headers, content: bytes, proof_content: bytes = None, **extra):
+    sha256, size = hashlib.sha256(content).hexdigest(), len(content)
+    payload = {"sha256": sha256, "size": size, "filename": "claimed.bin", **extra}
+    if proof_content is not None:
+        c = client.post("/files/by-hash/challenge", json={"sha256": sha256, "size": size}, headers=headers).json()
+        chunk = proof_content[c["offset"]:c["offset"] + c["length"]]
+        payload.update(challenge=c["challenge"], proof=hashlib.sha256(chunk).hexdigest())
+    return client.post("/files/by-hash", json=payload, headers=headers)
+
+
+def test_by_hash_requires_possession(client):
+    secret = os.urandom(200_000)
+    owner = login(client, "hash-owner")
+    assert client.post("/files/upload", files={"f": ("private.bin", secret)}, headers=owner).status_code == 200
+
+    other = login(client, "hash-other")
+    # Doar hash-ul (fara dovada) sau o dovada gresita: acelasi 404 ca pentru continut necunoscut
+    assert by_hash(client, other, secret).status_code == 404
+    assert by_hash(client, other, secret, proof_content=os.urandom(200_000)).status_code == 404
+    assert by_hash(client, other, os.urandom(100), proof_content=b"").status_code == 404
+    assert client.get("/files", headers=other).json() == []
+
+    # Challenge-ul unui alt utilizator nu e valid
+    sha256 = hashlib.sha256(secret).hexdigest()
+    c = client.post("/files/by-hash/challenge", json={"sha256": sha256, "size": len(secret)}, headers=owner).json()
+    proof = hashlib.sha256(secret[c["offset"]:c["offset"] + c["length"]]).hexdigest()
+    r = client.post("/files/by-hash", json={
+        "sha256": sha256, "size": len(secret), "filename": "x", "challenge": c["challenge"], "proof": proof,
+    }, headers=other)
+    assert r.status_code == 404
+    # Nici ca token de acces
+    assert client.get("/files", headers={"Authorization": f"Bearer {c['challenge']}"}).status_code == 401
+
+    # Cine are continutul il poate dovedi; proprietarul nu are nevoie de challenge
+    r = by_hash(client, other, secret, proof_content=secret)
+    assert r.status_code == 200 and r.json()["deduplicated"]
+    assert by_hash(client, owner, secret).status_code == 200
@@ -0,0 +1,53 @@
+import os
+import signal
+import threading
+import time
+
+from app import passwords
+from app.db import engine
+from app.routers import admin
+from tests.conftest import login
+
+
+def test_login_survives_killed_hasher(client):
+    login(client, "pool-kill")
+    pool = passwords._pool
+    pid = next(iter(pool._processes))
+    os.kill(pid, signal.SIGKILL)
+    deadline = time.monotonic() + 5
+    while pool._processes and pid in pool._processes and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    login(client, "pool-kill")
+    assert passwords._pool is not pool
+
+
+def test_import_waits_for_admission_instead_of_rejecting(monkeypatch):
+    monkeypatch.setattr(passwords, "PASSWORD_POOL_MAX_PENDING", 2)
+    monkeypatch.setattr(passwords, "_pending", 2)  # coada ocupata de login-uri
+    result = []
+    thread = threading.Thread(target=lambda: result.extend(passwords.hash_passwords(["a" * 6, "b" * 6, "c" * 6])))
+    thread.start()
+    time.sleep(0.3)
+    assert thread.is_alive() and not result
+
+    monkeypatch.setattr(passwords, "_pending", 0)
+    thread.join(10)
+    assert len(result) == 3 and all(h.startswith("$2") for h in result)
+    assert passwords._pending == 0
+
+
+def test_import_hashes_without_holding_a_connection(client, monkeypatch):
+    headers = login(client, "import-admin", "administrator")
+    checked_out = []
+
+    def hash_passwords(items):
+        checked_out.append(engine.pool.checkedout())
+        return passwords.hash_passwords(items)
+
+    monkeypatch.setattr(admin, "hash_passwords", hash_passwords)
+    rows = "username,email,password\n" + "".join(f"imp{i},imp{i}@example.com,secret{i}\n" for i in range(5))
+    r = client.post("/admin/users/import", files={"f": ("u.csv", rows.encode())}, headers=headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["created"] == 5
+    assert checked_out == [0]
@@ -0,0 +1,76 @@
+import io
+from datetime import datetime, timedelta
+
+from app import usage
+from app.db import SessionLocal
+from app.models import StorageUsage, Upload, User
+from app.storage import UPLOAD_EXPIRE_SECONDS
+from tests.conftest import login
+
+
+def set_quota(username: str, quota: int):
+    with SessionLocal() as db:
+        user_id = db.query(User.id).filter(User.username == username).scalar()
+        db.merge(StorageUsage(user_id=user_id, bytes=0, files=0, quota_bytes=quota))
+        db.commit()
+
+
+def test_presigned_policies_reserve_quota(client, storage):
+    headers = login(client, "presign-a")
+    set_quota("presign-a", 1000)
+
+    r = client.post("/files/uploads/presigned", json={"filename": "a.bin", "size": 600}, headers=headers)
+    assert r.status_code == 200, r.text
+    first = r.json()
+    assert first["max_size"] == 600
+    # A doua politie nu mai incape langa rezervarea primei
+    r = client.post("/files/uploads/presigned", json={"filename": "b.bin", "size": 600}, headers=headers)
+    assert r.status_code == 413
+
+    storage.put_object("bucket", first["object_name"], io.BytesIO(b"x" * 600), 600)
+    r = client.post("/files/uploads/presigned/complete", json={"upload_id": first["upload_id"]}, headers=headers)
+    assert r.status_code == 200, r.text
+    assert client.get(f"/files/uploads/{first['upload_id']}", headers=headers).status_code == 404
+
+    r = client.post("/files/uploads/presigned", json={"filename": "c.bin", "size": 400}, headers=headers)
+    assert r.status_code == 200, r.text
+    r = client.post("/files/uploads/presigned", json={"filename": "d.bin", "size": 1}, headers=headers)
+    assert r.status_code == 413
+
+
+def test_multipart_reservation_counts_presigned(client, storage):
+    headers = login(client, "presign-b")
+    set_quota("presign-b", 1000)
+    r = client.post("/files/uploads/presigned", json={"filename": "a.bin", "size": 800}, headers=headers)
+    assert r.status_code == 200
+    presigned = r.json()
+    r = client.post("/files/uploads", json={"filename": "b.bin", "size": 300}, headers=headers)
+    assert r.status_code == 413
+
+    # DELETE elibereaza rezervarea si sterge obiectul trimis, inca nelegat de un fisier
+    storage.put_object("bucket", presigned["object_name"], io.BytesIO(b"x" * 800), 800)
+    assert client.delete(f"/files/uploads/{presigned['upload_id']}", headers=headers).status_code == 200
+    assert presigned["object_name"] not in storage.objects
+    r = client.post("/files/uploads", json={"filename": "b.bin", "size": 300}, headers=headers)
+    assert r.status_code == 200, r.text
+
+
+def test_open_uploads_listed_and_expired(client, storage):
+    headers = login(client, "expire-a")
+    multipart = client.post("/files/uploads", json={"filename": "m.bin", "size": 10}, headers=headers).json()
+    presigned = client.post("/files/uploads/presigned", json={"filename": "p.bin", "size": 10}, headers=headers).json()
+
+    listed = client.get("/files/uploads", headers=headers).json()
+    assert {u["id"] for u in listed} == {multipart["id"], presigned["upload_id"]}
+    assert all(u["expires_at"] for u in listed)
+    assert client.get("/files/uploads", headers=login(client, "expire-b")).json() == []
+
+    with SessionLocal() as db:
+        db.query(Upload).filter(Upload.id == multipart["id"]).update(
+            {Upload.created_at: datetime.utcnow() - timedelta(seconds=UPLOAD_EXPIRE_SECONDS + 1)}
+        )
+        db.commit()
+    s3_upload_ids = set(storage.uploads)
+    assert usage.expire_uploads() == 1
+    assert [u["id"] for u in client.get("/files/uploads", headers=headers).json()] == [presigned["upload_id"]]
+    assert len(storage.uploads) == len(s3_upload_ids) - 1
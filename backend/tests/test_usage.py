@@ -0,0 +1,26 @@
+import io
+from datetime import timedelta
+
+from app import usage
+from app.db import SessionLocal
+from app.models import File as FileModel
+from tests.conftest import login
+from tests.test_worker import run_jobs, upload_image
+
+
+def test_reconcile_knows_derived_artifacts(client, storage, monkeypatch):
+    headers = login(client, "usage-a")
+    file_id = upload_image(client, headers, "derived.png", "yellow")
+    assert run_jobs(file_id) == "done"
+    with SessionLocal() as db:
+        thumbnail = db.get(FileModel, file_id).thumbnail_object
+    assert thumbnail in storage.objects
+
+    monkeypatch.setattr(usage, "ORPHAN_GRACE", timedelta(0))
+    report = usage.reconcile()
+    assert not any(name.startswith("derived/") for name in report["orphan_objects"])
+
+    storage.put_object("bucket", "derived/stray/thumbnail.jpg", io.BytesIO(b"x"), 1)
+    report = usage.reconcile()
+    assert "derived/stray/thumbnail.jpg" in report["orphan_objects"]
+    storage.remove_object("bucket", "derived/stray/thumbnail.jpg")
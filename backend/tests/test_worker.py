@@ -0,0 +1,78 @@
+import io
+import os
+import signal
+import time
+import zipfile
+
+import pytest
+from PIL import Image
+from sqlalchemy import select, update
+
+from app import transforms, worker
+from app.db import SessionLocal
+from app.models import File as FileModel, Job
+from tests.conftest import login
+
+
+def png(color) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(out, format="PNG")
+    return out.getvalue()
+
+
+def upload_image(client, headers, name: str, color) -> int:
+    r = client.post("/files/upload", files={"f": (name, png(color), "image/png")}, headers=headers)
+    assert r.status_code == 200, r.text
+    with SessionLocal() as db:
+        return db.execute(select(FileModel.id).where(FileModel.filename == name)).scalar_one()
+
+
+def run_jobs(file_id: int, rounds: int = 3) -> str:
+    """Ruleaza loturi pana cand jobul fisierului nu mai e in coada (reincercarile devin scadente imediat)"""
+    for _ in range(rounds):
+        worker.run_batch("tests")
+        with SessionLocal() as db:
+            status = db.execute(select(Job.status).where(Job.file_id == file_id)).scalar_one()
+            if status != "queued":
+                return status
+            db.execute(update(Job).where(Job.file_id == file_id).values(run_after=Job.created_at))
+            db.commit()
+    return status
+
+
+def test_thumbnail_job(client, storage):
+    headers = login(client, "worker-a")
+    file_id = upload_image(client, headers, "red.png", "red")
+    assert run_jobs(file_id) == "done"
+    with SessionLocal() as db:
+        thumbnail = db.get(FileModel, file_id).thumbnail_object
+    assert thumbnail in storage.objects
+
+
+def test_pool_rebuilt_after_process_dies(client):
+    headers = login(client, "worker-b")
+    run_jobs(upload_image(client, headers, "green.png", "green"))
+    pool = worker._pool
+    pid = next(iter(pool._processes))
+    os.kill(pid, signal.SIGKILL)
+    deadline = time.monotonic() + 5
+    while pool._processes and pid in pool._processes and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    file_id = upload_image(client, headers, "blue.png", "blue")
+    assert run_jobs(file_id) == "done"
+    assert worker._pool is not pool
+
+
+def test_decompression_bomb_is_permanent(monkeypatch):
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)
+    with pytest.raises(transforms.PermanentError):
+        transforms.make_thumbnail(png("white"))
+
+
+def test_docx_member_read_is_bounded(monkeypatch):
+    monkeypatch.setattr(transforms, "MAX_DOCX_XML_BYTES", 1000)
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("word/document.xml", "<w:p><w:t>" + "a" * 10_000_000 + "</w:t></w:p>")
+    assert len(transforms.extract_text(out.getvalue(), "bomb.docx")) <= 1000
@@ -8,13 +8,17 @@ type FileRec = { id: number; filename: string; size: number; object_name: string
 export default function Dashboard({ onLogout }: { onLogout: () => void }) {
   const [me, setMe] = useState<Me | null>(null)
   const [posts, setPosts] = useState<Post[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
   const [title, setTitle] = useState('')
   const [content, setContent] = useState('')
   const [files, setFiles] = useState<FileRec[]>([])
 
   useEffect(() => {
     api.get('/users/me').then(r => setMe(r.data))
-    api.get('/posts').then(r => setPosts(r.data))
+    api.get('/posts').then(r => {
+      setPosts(r.data.items)
+      setNextCursor(r.data.next_cursor)
+    })
     api.get('/files').then(r => setFiles(r.data)).catch(() => {})
   }, [])
 
@@ -26,6 +30,13 @@ export default function Dashboard({ onLogout }: { onLogout: () => void }) {
     setContent('')
   }
 
+  const loadMorePosts = async () => {
+    if (!nextCursor) return
+    const res = await api.get('/posts', { params: { cursor: nextCursor } })
+    setPosts([...posts, ...res.data.items])
+    setNextCursor(res.data.next_cursor)
+  }
+
   const upload = async (e: React.FormEvent<HTMLFormElement>) => {
     e.preventDefault()
     const input = e.currentTarget.elements.namedItem('f') as HTMLInputElement
@@ -83,6 +94,7 @@ export default function Dashboard({ onLogout }: { onLogout: () => void }) {
             <p>{p.content}</p>
           </article>
         ))}
+        {nextCursor && <button onClick={loadMorePosts}>Mai multe</button>}
       </section>
     </div>
   )